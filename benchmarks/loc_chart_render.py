@@ -0,0 +1,46 @@
+"""
+Benchmark of lines of code chart rendering time.
+Renders chart from synthetic yearly data of `YEARS` years with `LANGUAGES` languages.
+
+Usage: python3 benchmarks/loc_chart_render.py [runs]
+"""
+from os import environ
+from os.path import dirname, join
+from random import Random
+from sys import argv, path
+from tempfile import TemporaryDirectory
+from timeit import repeat
+
+path.insert(0, join(dirname(dirname(__file__)), "sources"))
+
+from graphics_chart_drawer import draw_loc_graph, draw_loc_svg  # noqa: E402
+from manager_environment import init_environment_manager  # noqa: E402
+
+
+YEARS = 12
+LANGUAGES = ["Python", "TypeScript", "Go", "Rust", "C++", "Java", "Kotlin", "Shell", "HTML", "CSS", "Unknown Language"]
+
+
+def make_yearly_data(seed: int = 0) -> dict:
+    random = Random(seed)
+    return {
+        year: {
+            quarter: {lang: {"add": random.randint(0, 50000), "del": random.randint(0, 20000)} for lang in random.sample(LANGUAGES, 7)}
+            for quarter in range(1, 5)
+        }
+        for year in range(2024 - YEARS, 2024)
+    }
+
+
+if __name__ == "__main__":
+    environ.setdefault("INPUT_GH_TOKEN", "benchmark")
+    environ.setdefault("INPUT_WAKATIME_API_KEY", "benchmark")
+    init_environment_manager()
+
+    runs = int(argv[1]) if len(argv) > 1 else 5
+    yearly_data = make_yearly_data()
+    colors = {lang: {"color": f"#{hash(lang) & 0xFFFFFF:06x}"} for lang in LANGUAGES[:-1]}
+    with TemporaryDirectory() as directory:
+        for backend, draw, extension in (("matplotlib", draw_loc_graph, "png"), ("svg", draw_loc_svg, "svg")):
+            timings = repeat(lambda: draw(yearly_data, colors, join(directory, f"bar_graph.{extension}")), number=1, repeat=runs)
+            print(f"LOC chart ({backend}), {YEARS} years: best {min(timings) * 1000:.1f} ms, mean {sum(timings) / len(timings) * 1000:.1f} ms over {runs} runs")
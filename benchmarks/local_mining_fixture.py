@@ -0,0 +1,132 @@
+"""
+Check of mining repository commit data from local clone, against fixture repository.
+Builds repository with two branches and two authors: `COMMITS` commits on main branch, feature branch forked from its middle with `COMMITS` / 2 commits more,
+every third commit is made by other author. Then mines it from blobless clone and compares aggregated commit data with the expected one.
+Also reports number of fetch requests git made while mining, file contents should be fetched in a single batch.
+Exits with non-zero code if the aggregates don't match.
+
+Usage: python3 benchmarks/local_mining_fixture.py [commits]
+"""
+from asyncio import run as run_async
+from datetime import datetime, timedelta, timezone
+from json import loads
+from os import environ
+from os.path import dirname, join
+from subprocess import run
+from sys import argv, exit, path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+path.insert(0, join(dirname(dirname(__file__)), "sources"))
+
+from commit_rollup import update_rollup_data  # noqa: E402
+from manager_environment import init_environment_manager  # noqa: E402
+from manager_debug import init_debug_manager  # noqa: E402
+from yearly_commit_calculator import update_data_with_local_commit_stats  # noqa: E402
+
+
+COMMITS = 60
+USER_EMAIL = "user@example.com"
+OTHER_EMAIL = "other@example.com"
+FIRST_COMMIT_DATE = datetime(2023, 12, 31, 20, tzinfo=timezone.utc)  # Commits are made hourly from this date, across year and quarter boundaries.
+REPOSITORY = {"name": "fixture", "owner": {"login": "fixture"}, "primaryLanguage": {"name": "Python"}, "isPrivate": False, "pushedAt": None}
+
+
+def git(repository: str, *args: str, env: dict = None) -> str:
+    return run(["git", "-C", repository, *args], capture_output=True, text=True, check=True, env={**environ, **(env or dict())}).stdout.strip()
+
+
+def make_fixture(repository: str, commits: int) -> dict:
+    """
+    Builds fixture repository and collects the expected commit data of the user.
+
+    :param repository: Directory to create repository in.
+    :param commits: Number of commits on main branch.
+    :returns: Dictionary of branch names and lists of the user commits dictionaries, reachable from each branch.
+    """
+    run(["git", "init", "--quiet", "--initial-branch=main", repository], check=True)
+    git(repository, "config", "uploadpack.allowFilter", "true")
+    git(repository, "config", "uploadpack.allowAnySHA1InWant", "true")
+
+    branches = {"main": list(), "feature": list()}
+    lines = dict()
+    fork = commits // 2
+    plan = [("main", index) for index in range(fork)] + [("feature", commits + index) for index in range(fork)]
+    plan += [("main", index) for index in range(fork, commits)]
+    for branch, index in plan:
+        if branch == "feature" and index == commits:
+            git(repository, "checkout", "--quiet", "-b", "feature")
+            branches["feature"] = list(branches["main"])
+        elif branch == "main" and git(repository, "branch", "--show-current") != "main":
+            git(repository, "checkout", "--quiet", "main")
+
+        name = f"{branch}_{index % 3}.txt"
+        count = index % 7 + 1
+        with open(join(repository, name), "w", encoding="utf-8") as file:
+            file.write("".join(f"{index}-{line}\n" for line in range(count)))
+        additions, deletions = count, lines.get((branch, name), 0)
+        lines[(branch, name)] = count
+
+        email = OTHER_EMAIL if index % 3 == 2 else USER_EMAIL
+        date = FIRST_COMMIT_DATE + timedelta(hours=index)
+        env = {"GIT_AUTHOR_NAME": email, "GIT_AUTHOR_EMAIL": email, "GIT_COMMITTER_NAME": email, "GIT_COMMITTER_EMAIL": email}
+        env.update({"GIT_AUTHOR_DATE": date.isoformat(), "GIT_COMMITTER_DATE": date.isoformat()})
+        git(repository, "add", name)
+        git(repository, "commit", "--quiet", "-m", f"Commit {index}", env=env)
+        if email == USER_EMAIL:
+            oid = git(repository, "rev-parse", "HEAD")
+            branches[branch] += [{"oid": oid, "committedDate": date.strftime("%Y-%m-%dT%H:%M:%SZ"), "additions": additions, "deletions": deletions}]
+    return branches
+
+
+def expected_commit_data(branches: dict) -> tuple:
+    """
+    Aggregates expected commit data: yearly data counts commits of every branch, rollup data counts each commit once.
+
+    :param branches: Dictionary of branch names and lists of the user commits dictionaries.
+    :returns: Yearly data, commit date and rollup data dictionaries.
+    """
+    yearly_data, date_data, rollup_data = dict(), dict(), dict()
+    for branch, commits in branches.items():
+        for commit in commits:
+            moment = datetime.strptime(commit["committedDate"], "%Y-%m-%dT%H:%M:%SZ")
+            loc = yearly_data.setdefault(moment.year, dict()).setdefault((moment.month - 1) // 3 + 1, dict()).setdefault("Python", {"add": 0, "del": 0})
+            loc["add"] += commit["additions"]
+            loc["del"] += commit["deletions"]
+            date_data.setdefault(REPOSITORY["name"], dict()).setdefault(branch, dict())[commit["oid"]] = commit["committedDate"]
+    unique = {commit["oid"]: commit for commits in branches.values() for commit in commits}
+    for commit in unique.values():
+        update_rollup_data(rollup_data, REPOSITORY["name"], "Python", commit["committedDate"], commit["additions"], commit["deletions"])
+    return yearly_data, date_data, rollup_data
+
+
+if __name__ == "__main__":
+    environ.setdefault("INPUT_GH_TOKEN", "benchmark")
+    environ.setdefault("INPUT_WAKATIME_API_KEY", "benchmark")
+    init_environment_manager()
+    init_debug_manager()
+
+    commits = int(argv[1]) if len(argv) > 1 else COMMITS
+    with TemporaryDirectory() as directory:
+        source, trace = join(directory, "source"), join(directory, "trace.json")
+        branches = make_fixture(source, commits)
+        expected = expected_commit_data(branches)
+
+        environ["GIT_TRACE2_EVENT"] = trace
+        actual = (dict(), dict(), dict())
+        start = perf_counter()
+        run_async(update_data_with_local_commit_stats(REPOSITORY, *actual, clone_url=f"file://{source}", emails=[USER_EMAIL]))
+        duration = perf_counter() - start
+        del environ["GIT_TRACE2_EVENT"]
+
+        with open(trace, encoding="utf-8") as file:
+            events = [loads(line) for line in file]
+        fetches = sum(1 for event in events if event["event"] == "start" and "fetch" in event["argv"][1:])
+
+    user_commits = len({commit["oid"] for commits in branches.values() for commit in commits})
+    print(f"Local mining of {commits + commits // 2} commits ({user_commits} by user): {duration * 1000:.1f} ms, {fetches} fetch requests")
+    for name, expected_data, actual_data in zip(("yearly", "commit date", "rollup"), expected, actual):
+        if expected_data != actual_data:
+            print(f"Mined {name} data doesn't match the expected one!")
+            exit(1)
+    print("Mined commit data matches the expected one.")
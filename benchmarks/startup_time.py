@@ -0,0 +1,41 @@
+"""
+Benchmark of action startup time, guards against eagerly imported heavy modules.
+Imports `main` module with `-X importtime` in a fresh interpreter and compares cumulative import time with `STARTUP_BUDGET_MS`.
+Exits with non-zero code if the budget is exceeded.
+
+Usage: python3 benchmarks/startup_time.py [budget in milliseconds]
+"""
+from os.path import dirname, join
+from subprocess import run
+from sys import argv, executable, exit
+
+STARTUP_BUDGET_MS = 600  # Maximum allowed cumulative import time of `main` module.
+FORBIDDEN_MODULES = ["matplotlib", "numpy", "github", "git", "pytz", "humanize", "yaml"]  # Modules that should be imported lazily.
+TOP_IMPORTS = 10  # Number of slowest imports to print.
+
+
+def measure_import_time() -> list:
+    sources = join(dirname(dirname(__file__)), "sources")
+    result = run([executable, "-X", "importtime", "-c", "import main"], cwd=sources, capture_output=True, text=True, check=True)
+    imports = list()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "self [us]" not in line:
+            _, cumulative, name = line.partition(":")[2].split("|")
+            imports += [(name.strip(), int(cumulative))]
+    return imports
+
+
+if __name__ == "__main__":
+    budget = int(argv[1]) if len(argv) > 1 else STARTUP_BUDGET_MS
+    imports = measure_import_time()
+    total = dict(imports)["main"] / 1000
+
+    print(f"Startup: 'main' imported in {total:.1f} ms (budget {budget} ms)")
+    for name, cumulative in sorted(imports, key=lambda i: i[1], reverse=True)[:TOP_IMPORTS]:
+        print(f"\t{cumulative / 1000:8.1f} ms {name}")
+
+    eager = sorted({name for name, _ in imports if name.split(".")[0] in FORBIDDEN_MODULES})
+    if len(eager) > 0:
+        print(f"Heavy modules imported eagerly: {', '.join(eager)}")
+    if total > budget or len(eager) > 0:
+        exit(1)
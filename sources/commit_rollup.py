@@ -0,0 +1,92 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+
+UNKNOWN_LANGUAGE = "Unknown Language"  # Language key of commits to repositories without primary language.
+
+
+def update_rollup_data(rollup_data: Dict, repo_name: str, language: Optional[str], committed_date: str, additions: int, deletions: int):
+    """
+    Updates rollup data with single commit.
+    Rollup data is a dictionary of repository names, languages, UTC day ordinals and UTC hours, with commits, additions and deletions counters for each hour.
+    Hours are stored in UTC, so that they can be converted to any local time zone upon query.
+
+    :param rollup_data: Rollup data dictionary to update.
+    :param repo_name: Name of repository the commit belongs to.
+    :param language: Primary language of the repository or None.
+    :param committed_date: Commit date (UTC, ISO format).
+    :param additions: Number of lines added by the commit.
+    :param deletions: Number of lines deleted by the commit.
+    """
+    moment = datetime.strptime(committed_date, "%Y-%m-%dT%H:%M:%SZ")
+    days = rollup_data.setdefault(repo_name, dict()).setdefault(language or UNKNOWN_LANGUAGE, dict())
+    counters = days.setdefault(moment.toordinal(), dict()).setdefault(moment.hour, [0, 0, 0])
+    _add_counters(counters, [1, additions, deletions])
+
+
+def merge_rollup_data(rollup_data: Dict, repo_rollup_data: Dict):
+    """
+    Adds counters of one rollup data dictionary to another.
+
+    :param rollup_data: Rollup data dictionary to update.
+    :param repo_rollup_data: Rollup data dictionary to add.
+    """
+    for repo_name, languages in repo_rollup_data.items():
+        for language, days in languages.items():
+            for day, hours in days.items():
+                for hour, counters in hours.items():
+                    target = rollup_data.setdefault(repo_name, dict()).setdefault(language, dict()).setdefault(day, dict()).setdefault(hour, [0, 0, 0])
+                    _add_counters(target, counters)
+
+
+def query_rollup_window(rollup_data: Dict, start: date, end: date, time_zone: str) -> Dict:
+    """
+    Aggregates rollup data counters of commits made within given local dates window.
+    Only days within the window are visited, so that query time depends on window length, not on commit history length.
+    Each counter is a list of commits, additions and deletions numbers.
+
+    :param rollup_data: Rollup data dictionary.
+    :param start: First local date of the window.
+    :param end: Last local date of the window (inclusive).
+    :param time_zone: Local time zone name.
+    :returns: Dictionary with "total" counter, "hours" (24 local hours) and "week_days" (Monday to Sunday) counter lists,
+        "languages" and "repositories" counter dictionaries.
+    """
+    from pytz import timezone, utc
+
+    local_zone = timezone(time_zone)
+    window = {
+        "total": [0, 0, 0],
+        "hours": [[0, 0, 0] for _ in range(24)],
+        "week_days": [[0, 0, 0] for _ in range(7)],
+        "languages": dict(),
+        "repositories": dict(),
+    }
+    local_dates = dict()
+
+    for repo_name, languages in rollup_data.items():
+        for language, days in languages.items():
+            for day in range(start.toordinal() - 1, end.toordinal() + 2):
+                for hour, counters in days.get(day, dict()).items():
+                    local_date = local_dates.get((day, hour))
+                    if local_date is None:
+                        local_date = utc.localize(datetime.fromordinal(day) + timedelta(hours=hour)).astimezone(local_zone)
+                        local_dates[(day, hour)] = local_date
+                    if start <= local_date.date() <= end:
+                        _add_counters(window["total"], counters)
+                        _add_counters(window["hours"][local_date.hour], counters)
+                        _add_counters(window["week_days"][local_date.weekday()], counters)
+                        _add_counters(window["languages"].setdefault(language, [0, 0, 0]), counters)
+                        _add_counters(window["repositories"].setdefault(repo_name, [0, 0, 0]), counters)
+    return window
+
+
+def _add_counters(target: List[int], counters: List[int]):
+    """
+    Adds counters to target counters in place.
+
+    :param target: Commits, additions and deletions counters to update.
+    :param counters: Commits, additions and deletions counters to add.
+    """
+    for index, value in enumerate(counters):
+        target[index] += value
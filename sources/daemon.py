@@ -0,0 +1,241 @@
+"""
+Long-running service mode of Readme Development Metrics.
+Keeps caches warm in memory and updates readme upon repository push events.
+"""
+from asyncio import Event, StreamReader, StreamWriter, TimeoutError, gather, get_running_loop, run, sleep, start_server, wait_for
+from datetime import datetime
+from hashlib import sha256
+from hmac import compare_digest, new as new_hmac
+from json import loads
+from os import listdir, remove
+from os.path import isdir, join
+from typing import Dict, Optional, Set, Tuple
+
+from manager_download import init_download_manager, DownloadManager as DM
+from manager_environment import init_environment_manager, EnvironmentManager as EM
+from manager_github import init_github_manager, GitHubManager as GHM
+from manager_debug import init_debug_manager, DebugManager as DBM
+from manager_wakatime import init_wakatime_manager, WakaTimeManager as WM
+from yearly_commit_calculator import calculate_repository_commit_data, merge_commit_data
+from main import collect_user_repositories, assemble_stats
+
+
+MAX_DEBOUNCE_MULTIPLIER = 10  # Maximum number of debounce periods an update can be postponed by a continuous burst of events.
+EVENTS_POLL_INTERVAL = 1.0  # Seconds between polls of events directory.
+LOCAL_HOST = "127.0.0.1"  # Interface webhook requests are accepted on if webhook secret isn't set.
+
+
+def _repository_key(repository: Dict) -> Tuple[str, str]:
+    """
+    Get repository identifier from either GraphQL repository node or push event repository object.
+
+    :param repository: Repository dictionary.
+    :returns: Tuple of owner login and repository name.
+    """
+    owner = repository["owner"]
+    return owner.get("login") or owner.get("name"), repository["name"]
+
+
+class UpdateService:
+    """
+    Class for handling push events and incremental readme updates.
+    Commit data is kept per repository, so that a push event triggers recalculation of the pushed repository only.
+    Events arriving in bursts are debounced into a single readme commit.
+    Events are accepted from GitHub webhook requests (`DAEMON_PORT`) and from JSON files dropped to `DAEMON_EVENTS_DIR`.
+    """
+
+    def __init__(self):
+        self._repositories: Dict[Tuple[str, str], Dict] = dict()
+        self._repository_data: Dict[Tuple[str, str], Tuple[Dict, Dict, Dict]] = dict()
+        self._pending: Set[Tuple[str, str]] = set()
+        self._event = Event()
+
+    async def _discover_repositories(self):
+        """
+        Collect user repositories list.
+        """
+        repositories = await collect_user_repositories()
+        self._repositories = {_repository_key(repo): repo for repo in repositories if repo["name"] not in EM.IGNORED_REPOS}
+
+    async def warm_up(self):
+        """
+        Collect all user repositories and their commit data, render and commit initial readme.
+        """
+        DBM.i("Warming up service caches...")
+        await self._discover_repositories()
+        for ind, (key, repo) in enumerate(self._repositories.items()):
+            DBM.i(f"\t{ind + 1}/{len(self._repositories)} Retrieving repo: {'[private]' if repo['isPrivate'] else '/'.join(key)}")
+            self._repository_data[key] = await calculate_repository_commit_data(repo)
+        await self._update_readme()
+        DBM.g("Service caches are warm!")
+
+    def submit(self, payload: Dict):
+        """
+        Schedule update for repository the push event payload refers to.
+
+        :param payload: GitHub push event payload.
+        """
+        repository = payload.get("repository")
+        if repository is None:
+            DBM.w("\tEvent without repository received, skipping.")
+            return
+        key = _repository_key(repository)
+        DBM.i(f"\tPush event received for repository: {'/'.join(key)}")
+        self._pending.add(key)
+        self._event.set()
+
+    def _verify_signature(self, headers: Dict[str, str], body: bytes) -> bool:
+        """
+        Check webhook request signature if webhook secret is configured.
+        Requests without signature are only accepted on local interface, see `serve`.
+
+        :param headers: Request headers, lowercase names.
+        :param body: Request body.
+        :returns: True if the request is trusted, false otherwise.
+        """
+        if EM.DAEMON_WEBHOOK_SECRET == "":
+            return True
+        expected = f"sha256={new_hmac(EM.DAEMON_WEBHOOK_SECRET.encode('utf-8'), body, sha256).hexdigest()}"
+        return compare_digest(expected, headers.get("x-hub-signature-256", ""))
+
+    async def _handle_webhook(self, reader: StreamReader, writer: StreamWriter):
+        """
+        Handle single GitHub webhook HTTP request.
+
+        :param reader: Connection input stream.
+        :param writer: Connection output stream.
+        """
+        status = "202 Accepted"
+        try:
+            await reader.readline()
+            headers = dict()
+            while (line := (await reader.readline()).decode("latin-1").strip()) != "":
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", "0")))
+
+            if not self._verify_signature(headers, body):
+                status = "401 Unauthorized"
+            elif headers.get("x-github-event", "push") == "push":
+                self.submit(loads(body))
+        except Exception as e:
+            DBM.w(f"\tMalformed webhook request: {e}")
+            status = "400 Bad Request"
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+        writer.close()
+
+    async def _watch_events_directory(self, events_dir: str):
+        """
+        Poll events directory for JSON payload files, submit and remove them.
+
+        :param events_dir: Directory to watch for event files.
+        """
+        while True:
+            for file_name in sorted(listdir(events_dir)):
+                if not file_name.endswith(".json"):
+                    continue
+                path = join(events_dir, file_name)
+                try:
+                    with open(path, encoding="utf-8") as event_file:
+                        self.submit(loads(event_file.read()))
+                except Exception as e:
+                    DBM.w(f"\tMalformed event file '{file_name}': {e}")
+                remove(path)
+            await sleep(EVENTS_POLL_INTERVAL)
+
+    async def _debounce(self):
+        """
+        Wait for events and update readme once no new events arrived for `DAEMON_DEBOUNCE` seconds.
+        A continuous burst of events postpones update for `MAX_DEBOUNCE_MULTIPLIER` debounce periods at most.
+        """
+        while True:
+            await self._event.wait()
+            deadline = get_running_loop().time() + EM.DAEMON_DEBOUNCE * MAX_DEBOUNCE_MULTIPLIER
+            while get_running_loop().time() < deadline:
+                self._event.clear()
+                try:
+                    await wait_for(self._event.wait(), EM.DAEMON_DEBOUNCE)
+                except TimeoutError:
+                    break
+            self._event.clear()
+            try:
+                await self._flush()
+            except Exception as e:
+                DBM.p(f"Readme update failed: {e}")
+
+    async def _flush(self):
+        """
+        Recalculate commit data of all pending repositories, render and commit readme.
+        """
+        pending, self._pending = self._pending, set()
+        if len(pending) == 0:
+            return
+        DBM.i(f"Updating readme for {len(pending)} repositories...")
+
+        if not pending.issubset(self._repositories.keys()):
+            await self._discover_repositories()
+        for key in pending:
+            if key in self._repositories:
+                self._repository_data[key] = await calculate_repository_commit_data(self._repositories[key], refresh=key in self._repository_data)
+        for key in set(self._repository_data.keys()) - set(self._repositories.keys()):
+            del self._repository_data[key]
+
+        await WM.refresh()
+        await self._update_readme()
+
+    async def _update_readme(self):
+        """
+        Render readme from per-repository commit data and commit or output it.
+        The repo clone is synchronized with remote before stats are assembled, so that remote changes are neither lost nor cause push rejection,
+        and files (e.g. charts) stats assembling puts into the clone are not discarded by the synchronization.
+        """
+        if not EM.DEBUG_RUN:
+            GHM.sync_repo()
+        yearly_data, commit_data, rollup_data = merge_commit_data(self._repository_data.values())
+        stats = await assemble_stats(list(self._repositories.values()), yearly_data, commit_data, rollup_data)
+        if not EM.DEBUG_RUN:
+            GHM.update_readme(stats)
+            GHM.commit_update()
+        else:
+            GHM.set_github_output(stats)
+        DBM.g(f"Readme updated at {datetime.now()}!")
+
+    async def serve(self, events_dir: Optional[str] = None):
+        """
+        Run service: warm caches up, then listen for webhook requests and events directory forever.
+        Webhook requests are accepted on all interfaces only if `DAEMON_WEBHOOK_SECRET` is set, on local interface otherwise.
+
+        :param events_dir: Directory to watch for event files, no directory is watched if None.
+        """
+        await self.warm_up()
+        tasks = [self._debounce()]
+        if EM.DAEMON_PORT != 0:
+            host = None if EM.DAEMON_WEBHOOK_SECRET != "" else LOCAL_HOST
+            if host is not None:
+                DBM.w(f"Webhook secret isn't set, accepting webhook requests from {host} only!")
+            server = await start_server(self._handle_webhook, host=host, port=EM.DAEMON_PORT)
+            DBM.i(f"Listening for webhook requests on port {EM.DAEMON_PORT}...")
+            tasks += [server.serve_forever()]
+        if events_dir is not None:
+            DBM.i(f"Watching events directory '{events_dir}'...")
+            tasks += [self._watch_events_directory(events_dir)]
+        await gather(*tasks)
+
+
+async def main():
+    init_github_manager()
+    await init_download_manager(GHM.USER.login)
+    await init_wakatime_manager()
+    try:
+        await UpdateService().serve(EM.DAEMON_EVENTS_DIR if isdir(EM.DAEMON_EVENTS_DIR) else None)
+    finally:
+        WM.close()
+        await DM.close_remote_resources()
+
+
+if __name__ == "__main__":
+    init_environment_manager()
+    init_debug_manager()
+    DBM.g("Service started at $date.", date=datetime.now())
+    run(main())
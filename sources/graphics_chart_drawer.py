@@ -1,55 +1,159 @@
-from typing import Dict
-
-from numpy import arange, array, add, amax, zeros
-import matplotlib.patches as mpatches
-import matplotlib.pyplot as plt
+from hashlib import sha256
+from importlib.metadata import version
+from json import dumps
+from math import floor, log10
+from os.path import isfile, join
+from shutil import copy
+from typing import TYPE_CHECKING, Dict, List, Tuple
+from xml.sax.saxutils import escape
 
 from manager_download import DownloadManager as DM
+from manager_environment import EnvironmentManager as EM
 from manager_file import FileManager as FM
+from manager_github import GitHubManager as GHM
+from manager_debug import DebugManager as DBM
+
+if TYPE_CHECKING:
+    from numpy import ndarray
 
 
 MAX_LANGUAGES = 5  # Number of top languages to add to chart, for each year quarter
-GRAPH_PATH = f"{FM.ASSETS_DIR}/bar_graph.png"  # Chart saving path.
 
+SVG_RENDERER_VERSION = "1"  # Version of SVG renderer, should be increased on every change of the SVG chart layout.
+SVG_DEFAULT_COLOR = "#7f7f7f"  # Color of languages missing from linguist (same as matplotlib 'tab:gray').
+SVG_YEAR_WIDTH = 100  # Width of one year (four quarter bars) in pixels.
+SVG_PLOT_HEIGHT = 400  # Height of plotting area in pixels.
+SVG_MARGIN = 80  # Width of margins around plotting area in pixels.
+SVG_LEGEND_WIDTH = 200  # Width of legend area in pixels.
+
+
+def get_graph_path() -> str:
+    """
+    Gets chart saving path, its extension depends on `CHART_BACKEND` variable.
 
-async def create_loc_graph(yearly_data: Dict, save_path: str):
+    :returns: Chart saving path.
+    """
+    return f"{FM.ASSETS_DIR}/bar_graph.{'svg' if EM.CHART_BACKEND == 'svg' else 'png'}"
+
+
+async def create_loc_graph(yearly_data: Dict, save_path: str) -> bool:
     """
     Draws graph of lines of code written by user by quarters of years.
     Picks top `MAX_LANGUAGES` languages from each quarter only.
+    The graph is drawn with matplotlib or written as SVG directly, depending on `CHART_BACKEND` variable.
+    Rendering is skipped if the graph file in readme repo was already rendered from exactly the same inputs, the file is copied from the repo instead.
+    Inputs hash is saved next to the graph file, to be added to readme repo along with it (see `GitHubManager.update_chart`).
 
     :param yearly_data: GitHub user yearly data.
     :param save_path: Path to save the graph file.
+    :returns: True if the graph file was rendered, false if previously rendered file was reused.
     """
     colors = await DM.get_remote_yaml("linguist")
-    if colors is None:
-        colors = dict()
-    years = len(yearly_data.keys())
-    year_indexes = arange(years)
+    colors = dict() if colors is None else colors
+
+    input_hash = _hash_loc_graph_inputs(yearly_data, colors)
+    repo_path = join(GHM.REPO.working_tree_dir, save_path)
+    if isfile(repo_path) and isfile(f"{repo_path}.sha256"):
+        with open(f"{repo_path}.sha256", encoding="utf-8") as hash_file:
+            if hash_file.read() == input_hash:
+                copy(repo_path, save_path)
+                DBM.g("\tChart inputs unchanged, previously rendered chart reused!")
+                return False
+
+    if EM.CHART_BACKEND == "svg":
+        draw_loc_svg(yearly_data, colors, save_path)
+    else:
+        draw_loc_graph(yearly_data, colors, save_path)
+    FM.write_file(f"{save_path}.sha256", input_hash)
+    return True
+
+
+def _hash_loc_graph_inputs(yearly_data: Dict, colors: Dict) -> str:
+    """
+    Hashes everything graph of lines of code depends on: trimmed yearly data, language colors, chart style and renderer version.
+
+    :param yearly_data: GitHub user yearly data.
+    :param colors: GitHub linguist languages dictionary.
+    :returns: Hex digest of the inputs.
+    """
+    languages, cells = _collect_loc_cells(yearly_data)
+    inputs = {
+        "years": sorted(yearly_data.keys()),
+        "languages": [[lang, colors.get(lang, dict()).get("color")] for lang in languages],
+        "cells": cells,
+        "style": [MAX_LANGUAGES, get_graph_path()],
+        "backend": [EM.CHART_BACKEND, SVG_RENDERER_VERSION if EM.CHART_BACKEND == "svg" else version("matplotlib")],
+    }
+    return sha256(dumps(inputs).encode("utf-8")).hexdigest()
+
 
-    languages_all_loc = dict()
+def _collect_loc_cells(yearly_data: Dict) -> Tuple[List[str], List[Tuple[int, int, int, int, int]]]:
+    """
+    Collects lines of code of top `MAX_LANGUAGES` languages of each quarter.
+
+    :param yearly_data: GitHub user yearly data.
+    :returns: Language names (in order of appearance) and list of (year index, quarter index, language index, additions, deletions) tuples.
+    """
+    languages = dict()
+    cells = list()
     for i, y in enumerate(sorted(yearly_data.keys())):
         for q in yearly_data[y].keys():
             langs = sorted(yearly_data[y][q].keys(), key=lambda n: yearly_data[y][q][n]["add"] + yearly_data[y][q][n]["del"], reverse=True)[0:MAX_LANGUAGES]
-
             for lang in langs:
-                if lang not in languages_all_loc:
-                    languages_all_loc[lang] = zeros((years, 4, 2), dtype=int)
-                languages_all_loc[lang][i][q - 1] = array([yearly_data[y][q][lang]["add"], yearly_data[y][q][lang]["del"]])
+                cells += [(i, q - 1, languages.setdefault(lang, len(languages)), yearly_data[y][q][lang]["add"], yearly_data[y][q][lang]["del"])]
+    return list(languages.keys()), cells
 
-    fig = plt.figure()
-    ax = fig.add_axes([0, 0, 1.5, 1])
 
-    language_handles = []
-    cumulative = zeros((years, 4, 2), dtype=int)
+def _make_loc_tensor(yearly_data: Dict) -> Tuple[List[str], "ndarray"]:
+    """
+    Collects lines of code of top `MAX_LANGUAGES` languages of each quarter into a single tensor.
 
-    for key, value in languages_all_loc.items():
-        color = colors[key].get("color", "tab:gray")
-        language_handles += [mpatches.Patch(color=color, label=key)]
+    :param yearly_data: GitHub user yearly data.
+    :returns: Language names (in order of appearance) and tensor of shape (years, quarters, languages, [additions, deletions]).
+    """
+    from numpy import array, stack, zeros
 
-        for quarter in range(4):
-            ax.bar(year_indexes + quarter * 0.21, value[:, quarter][:, 0], 0.2, bottom=cumulative[:, quarter][:, 0], color=color)
-            ax.bar(year_indexes + quarter * 0.21, -value[:, quarter][:, 1], 0.2, bottom=-cumulative[:, quarter][:, 1], color=color)
-            cumulative[:, quarter] = add(cumulative[:, quarter], value[:, quarter])
+    languages, cells = _collect_loc_cells(yearly_data)
+    loc = zeros((len(yearly_data), 4, len(languages), 2), dtype=int)
+    if len(cells) > 0:
+        year, quarter, language, additions, deletions = array(cells, dtype=int).T
+        loc[year, quarter, language] = stack((additions, deletions), axis=-1)
+    return languages, loc
+
+
+def draw_loc_graph(yearly_data: Dict, colors: Dict, save_path: str):
+    """
+    Draws graph of lines of code from already collected linguist colors.
+    All the bars are drawn in a single call, bottoms of stacked bars are calculated with cumulative sum.
+
+    :param yearly_data: GitHub user yearly data.
+    :param colors: GitHub linguist languages dictionary.
+    :param save_path: Path to save the graph file.
+    """
+    from numpy import arange, array, amax, broadcast_to, cumsum
+    import matplotlib.patches as mpatches
+    import matplotlib.pyplot as plt
+
+    years = len(yearly_data.keys())
+    year_indexes = arange(years)
+    languages, loc = _make_loc_tensor(yearly_data)
+    cumulative = cumsum(loc, axis=2)
+    language_colors = [colors.get(lang, dict()).get("color", "tab:gray") for lang in languages]
+
+    fig = plt.figure()
+    ax = fig.add_axes([0, 0, 1.5, 1])
+
+    positions = broadcast_to((year_indexes[:, None] + arange(4)[None, :] * 0.21)[:, :, None, None], loc.shape)
+    bar_colors = broadcast_to(arange(len(languages))[None, None, :, None], loc.shape)
+    signs = array([1, -1])
+    drawn = loc != 0
+    ax.bar(
+        positions[drawn],
+        (loc * signs)[drawn],
+        0.2,
+        bottom=((cumulative - loc) * signs)[drawn],
+        color=[language_colors[c] for c in bar_colors[drawn]],
+    )
     ax.axhline(y=0.5, lw=0.5, snap=True, color="k")
 
     ax.set_ylabel("LOC added", fontdict=dict(weight="bold"))
@@ -59,6 +163,7 @@ async def create_loc_graph(yearly_data: Dict, save_path: str):
     sax.set_xticks(year_indexes + 0.42, labels=sorted(yearly_data.keys()))
     sax.spines["top"].set_visible(False)
 
+    language_handles = [mpatches.Patch(color=color, label=lang) for lang, color in zip(languages, language_colors)]
     ax.legend(title="Language", handles=language_handles, loc="upper left", bbox_to_anchor=(1, 1), framealpha=0, title_fontproperties=dict(weight="bold"))
 
     sax.tick_params(axis="both", length=0)
@@ -66,11 +171,95 @@ async def create_loc_graph(yearly_data: Dict, save_path: str):
     ax.spines["top"].set_visible(False)
     ax.spines["right"].set_visible(False)
 
-    max_offset = 0.05 * amax(cumulative.flatten())
-    joined = cumulative.reshape(-1, cumulative.shape[-1])
-    max_additions = amax(joined[:, 0])
-    max_deletions = amax(joined[:, 1])
+    totals = loc.sum(axis=2).reshape(-1, 2)
+    max_offset = 0.05 * amax(totals, initial=0)
+    max_additions = amax(totals[:, 0], initial=0)
+    max_deletions = amax(totals[:, 1], initial=0)
     plt.ylim(top=max_additions + max_offset, bottom=-max_deletions - max_offset)
 
     plt.savefig(save_path, bbox_inches="tight")
     plt.close(fig)
+
+
+def _nice_tick_step(span: float, ticks: int = 6) -> int:
+    """
+    Picks round axis tick step (1, 2 or 5 multiplied by power of ten) for the given axis span.
+
+    :param span: Axis values span.
+    :param ticks: Approximate number of ticks.
+    :returns: Tick step.
+    """
+    raw = max(span / ticks, 1)
+    magnitude = 10 ** floor(log10(raw))
+    return next(step * magnitude for step in (1, 2, 5, 10) if step * magnitude >= raw)
+
+
+def draw_loc_svg(yearly_data: Dict, colors: Dict, save_path: str):
+    """
+    Writes graph of lines of code as SVG file, without plotting library.
+    Chart layout mimics `draw_loc_graph`: stacked quarter bars, quarter and year tick labels and language legend.
+
+    :param yearly_data: GitHub user yearly data.
+    :param colors: GitHub linguist languages dictionary.
+    :param save_path: Path to save the graph file.
+    """
+    years = len(yearly_data.keys())
+    languages, cells = _collect_loc_cells(yearly_data)
+    language_colors = [escape(colors.get(lang, dict()).get("color", SVG_DEFAULT_COLOR)) for lang in languages]
+
+    bars = list()
+    cumulative = [[[0, 0] for _ in range(4)] for _ in range(years)]
+    for year, quarter, language, additions, deletions in sorted(cells, key=lambda c: c[2]):
+        for sign, loc, index in ((1, additions, 0), (-1, deletions, 1)):
+            if loc != 0:
+                bars += [(year + quarter * 0.21, sign * cumulative[year][quarter][index], sign * loc, language_colors[language])]
+            cumulative[year][quarter][index] += loc
+
+    max_additions = max([quarter[0] for year in cumulative for quarter in year], default=0)
+    max_deletions = max([quarter[1] for year in cumulative for quarter in year], default=0)
+    max_offset = 0.05 * max(max_additions, max_deletions)
+    top, bottom = max_additions + max_offset, -max_deletions - max_offset
+    span = max(top - bottom, 1)
+
+    left, right = -0.15, years - 0.07
+    plot_width = (right - left) * SVG_YEAR_WIDTH
+    width, height = SVG_MARGIN * 2 + plot_width + SVG_LEGEND_WIDTH, SVG_MARGIN * 2 + SVG_PLOT_HEIGHT
+
+    def x(value: float) -> float:
+        return round(SVG_MARGIN + (value - left) * SVG_YEAR_WIDTH, 2)
+
+    def y(value: float) -> float:
+        return round(SVG_MARGIN + (top - value) / span * SVG_PLOT_HEIGHT, 2)
+
+    svg = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" viewBox="0 0 {width:.0f} {height:.0f}"',
+        'font-family="DejaVu Sans, sans-serif" font-size="12">',
+        f'<rect width="{width:.0f}" height="{height:.0f}" fill="white"/>',
+    ]
+    for position, bar_bottom, bar_height, color in bars:
+        upper, lower = y(max(bar_bottom, bar_bottom + bar_height)), y(min(bar_bottom, bar_bottom + bar_height))
+        svg += [f'<rect x="{x(position - 0.1)}" y="{upper}" width="{SVG_YEAR_WIDTH * 0.2:.0f}" height="{round(lower - upper, 2)}" fill="{color}"/>']
+    svg += [f'<line x1="{x(left)}" x2="{x(right)}" y1="{y(0.5)}" y2="{y(0.5)}" stroke="black" stroke-width="0.5"/>']
+
+    svg += [f'<line x1="{x(left)}" x2="{x(left)}" y1="{y(top)}" y2="{y(bottom)}" stroke="black"/>']
+    svg += [f'<line x1="{x(left)}" x2="{x(right)}" y1="{y(bottom)}" y2="{y(bottom)}" stroke="black"/>']
+    step = _nice_tick_step(span)
+    for tick in range(int(bottom // step + 1) * step, int(top) + 1, step):
+        svg += [f'<line x1="{x(left) - 4}" x2="{x(left)}" y1="{y(tick)}" y2="{y(tick)}" stroke="black"/>']
+        svg += [f'<text x="{x(left) - 7}" y="{y(tick)}" text-anchor="end" dominant-baseline="middle">{tick}</text>']
+    svg += [f'<text transform="translate({SVG_MARGIN / 4:.0f} {y((top + bottom) / 2)}) rotate(-90)" text-anchor="middle" font-weight="bold">LOC added</text>']
+
+    for index, year in enumerate(sorted(yearly_data.keys())):
+        svg += [f'<text x="{x(index + 0.42)}" y="{SVG_MARGIN - 10}" text-anchor="middle">{year}</text>']
+        for quarter in range(4):
+            svg += [f'<text x="{x(index + quarter * 0.21)}" y="{y(bottom) + 18}" text-anchor="middle">Q{quarter + 1}</text>']
+
+    legend = x(right) + SVG_MARGIN / 4
+    svg += [f'<text x="{legend + SVG_LEGEND_WIDTH / 2:.0f}" y="{SVG_MARGIN}" text-anchor="middle" font-weight="bold">Language</text>']
+    for index, (lang, color) in enumerate(zip(languages, language_colors)):
+        row = SVG_MARGIN + 20 * (index + 1)
+        svg += [f'<rect x="{legend}" y="{row - 6}" width="24" height="10" fill="{color}"/>']
+        svg += [f'<text x="{legend + 32}" y="{row}" dominant-baseline="middle">{escape(lang)}</text>']
+    svg += ["</svg>"]
+
+    FM.write_file(save_path, "\n".join(svg))
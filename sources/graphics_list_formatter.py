@@ -1,14 +1,14 @@
 from enum import Enum
 from typing import Dict, Tuple, List
-from datetime import datetime
-
-from pytz import timezone, utc
+from datetime import datetime, timedelta
 
+from commit_rollup import query_rollup_window
 from manager_environment import EnvironmentManager as EM
 
 
 DAY_TIME_NAMES = ["Morning", "Daytime", "Evening", "Night"]  # Localization identifiers for different times of day.
 WEEK_DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]  # Localization identifiers for different days of week.
+NIGHT_HOURS = (18, 6)  # Local hours night starts and ends at, commits made at night make a night owl.
 
 
 class Symbol(Enum):
@@ -27,6 +27,16 @@ def make_graph(percent: float):
     return f"{done_block * percent_quart}{empty_block * (25 - percent_quart)}"
 
 
+def is_night(hour: int) -> bool:
+    """
+    Check if local hour belongs to night, see `NIGHT_HOURS`.
+
+    :param hour: Local hour.
+    :returns: True for night hours, false otherwise.
+    """
+    return hour >= NIGHT_HOURS[0] or hour < NIGHT_HOURS[1]
+
+
 def make_list(data: List = None, names: List[str] = None, texts: List[str] = None, percents: List[float] = None, top_num: int = 7, sort: bool = True) -> str:
     if data is not None:
         names = [value for item in data for key, value in item.items() if key == "name"] if names is None else names
@@ -51,19 +61,21 @@ def make_list(data: List = None, names: List[str] = None, texts: List[str] = Non
 
 
 async def make_commit_day_time_list(time_zone: str, repositories: Dict, commit_dates: Dict) -> str:
+    from pytz import timezone, utc
+
     stats = str()
     day_times = [0] * 4  # 0 - 6, 6 - 12, 12 - 18, 18 - 24
     week_days = [0] * 7  # Monday, Tuesday, Wednesday, Thursday, Friday, Saturday, Sunday
+    night = 0
 
-    for repository in repositories:
-        if repository["name"] not in commit_dates.keys():
-            continue
-
-        for committed_date in [commit_date for branch in commit_dates[repository["name"]].values() for commit_date in branch.values()]:
+    # Commit dates are keyed by repository name, so same-named repositories (of different owners) share a single entry and are counted once.
+    for name in {repository["name"] for repository in repositories} & commit_dates.keys():
+        for committed_date in [commit_date for branch in commit_dates[name].values() for commit_date in branch.values()]:
             local_date = datetime.strptime(committed_date, "%Y-%m-%dT%H:%M:%SZ")
             date = local_date.replace(tzinfo=utc).astimezone(timezone(time_zone))
 
             day_times[date.hour // 6] += 1
+            night += is_night(date.hour)
             week_days[date.isoweekday() - 1] += 1
 
     sum_day = sum(day_times)
@@ -73,21 +85,50 @@ async def make_commit_day_time_list(time_zone: str, repositories: Dict, commit_d
     dt_names = [f"{DAY_TIME_NAMES[i]}" for i in range(len(day_times))]
     dt_texts = [f"{day_time} commits" for day_time in day_times]
     dt_percents = [0 if sum_day == 0 else round((day_time / sum_day) * 100, 2) for day_time in day_times]
-    title = "🐥 I'm an early bird" if sum(day_times[0:2]) >= sum(day_times[2:4]) else "🦉 I'm a night owl"
-    stats += f"**{title}** \n\n```text\n{make_list(names=dt_names, texts=dt_texts, percents=dt_percents, top_num=7, sort=False)}\n```\n"
+    title = "🐥 I'm an early bird" if sum_day - night >= night else "🦉 I'm a night owl"
+    if EM.SHOW_COMMIT:
+        stats += f"**{title}** \n\n```text\n{make_list(names=dt_names, texts=dt_texts, percents=dt_percents, top_num=7, sort=False)}\n```\n"
 
     wd_names = [week_day for week_day in WEEK_DAY_NAMES]
     wd_texts = [f"{week_day} commits" for week_day in week_days]
     wd_percents = [0 if sum_week == 0 else round((week_day / sum_week) * 100, 2) for week_day in week_days]
     title = f"I'm most productive on {wd_names[wd_percents.index(max(wd_percents))]}"
-    stats += f"📅 **{title}** \n\n```text\n{make_list(names=wd_names, texts=wd_texts, percents=wd_percents, top_num=7, sort=False)}\n```\n"
+    if EM.SHOW_DAYS_OF_WEEK:
+        stats += f"📅 **{title}** \n\n```text\n{make_list(names=wd_names, texts=wd_texts, percents=wd_percents, top_num=7, sort=False)}\n```\n"
 
     return stats
 
 
+async def make_commit_window_list(time_zone: str, rollup_data: Dict, days: int) -> str:
+    """
+    Make section of commits made within recent time window: totals, night owl ratio and languages list.
+
+    :param time_zone: Local time zone name.
+    :param rollup_data: Rollup data dictionary.
+    :param days: Window length in days, including current day.
+    :returns: String representation of the section.
+    """
+    from pytz import timezone
+
+    end = datetime.now(timezone(time_zone)).date()
+    window = query_rollup_window(rollup_data, end - timedelta(days=days - 1), end, time_zone)
+    commits, additions, deletions = window["total"]
+    night = sum(counters[0] for hour, counters in enumerate(window["hours"]) if is_night(hour))
+
+    languages = sorted(window["languages"].keys(), key=lambda lang: window["languages"][lang][0], reverse=True)
+    texts = [f"{window['languages'][lang][0]} commits" for lang in languages]
+    percents = [0 if commits == 0 else round(window["languages"][lang][0] / commits * 100, 2) for lang in languages]
+
+    title = f"⏳ In the last {days} days I made {commits} commits (+{additions} / -{deletions} lines)"
+    owl = f"🦉 {0 if commits == 0 else round(night / commits * 100)}% of them at night"
+    return f"**{title}** \n\n{owl}\n\n```text\n{make_list(names=languages, texts=texts, percents=percents)}\n```\n"
+
+
 def make_language_per_repo_list(repositories: Dict) -> str:
     language_count = dict()
     repos_with_language = [repo for repo in repositories if repo["primaryLanguage"] is not None]
+    if len(repos_with_language) == 0:
+        return str()
     for repo in repos_with_language:
         language = repo["primaryLanguage"]["name"]
         language_count[language] = language_count.get(language, {"count": 0})
@@ -1,83 +1,185 @@
 """
 Readme Development Metrics With waka time progress
 """
-from asyncio import run
+from asyncio import Queue, create_task, run
 from datetime import datetime
-from typing import Dict
+from typing import AsyncIterator, Dict, List, Optional
 from urllib.parse import quote
 
-from humanize import intword
 from manager_download import init_download_manager, DownloadManager as DM
-from manager_environment import EnvironmentManager as EM
+from manager_environment import init_environment_manager, EnvironmentManager as EM
 from manager_github import init_github_manager, GitHubManager as GHM
 from manager_debug import init_debug_manager, DebugManager as DBM
+from manager_profile import init_profile_manager, ProfileManager as PM
+from manager_wakatime import init_wakatime_manager, WakaTimeManager as WM
 from yearly_commit_calculator import calculate_commit_data
-from graphics_list_formatter import make_list, make_commit_day_time_list
+from graphics_chart_drawer import create_loc_graph, get_graph_path
+from graphics_list_formatter import make_list, make_commit_day_time_list, make_commit_window_list, make_language_per_repo_list
+from readme_section_renderer import Section, SectionRenderer
+
+
+async def iterate_user_repositories(collected: Optional[List[Dict]] = None) -> AsyncIterator[Dict]:
+    """
+    Discover repositories user created, collaborated or contributed to.
+    Both repository lists are queried concurrently, repositories are yielded page by page as soon as they arrive.
+    Repositories are deduplicated by owner login and name, forks user contributed to are skipped.
+
+    :param collected: List to append yielded repositories to, nothing is appended if None.
+    :returns: Iterator of repository dictionaries.
+    """
+    pages = Queue()
+
+    async def discover(query: str, description: str):
+        try:
+            async for page, _ in DM.iterate_remote_graphql_pages(query, username=GHM.USER.login):
+                await pages.put(page)
+            DBM.g(f"\t{description} collected!")
+        finally:
+            await pages.put(None)
+
+    discoveries = [
+        create_task(discover("user_repository_list", "User repository list")),
+        create_task(discover("repos_contributed_to", "User contributed to repository list")),
+    ]
+    try:
+        discovered = set()
+        running = len(discoveries)
+        while running > 0:
+            page = await pages.get()
+            if page is None:
+                running -= 1
+                continue
+            for repo in page:
+                if repo is None or repo.get("isFork", False) or (repo["owner"]["login"], repo["name"]) in discovered:
+                    continue
+                discovered.add((repo["owner"]["login"], repo["name"]))
+                if collected is not None:
+                    collected += [repo]
+                yield repo
+        for discovery in discoveries:
+            discovery.result()
+    finally:
+        for discovery in discoveries:
+            discovery.cancel()
+
+
+async def collect_user_repositories() -> List[Dict]:
+    """
+    Discover all repositories user created, collaborated or contributed to, see `iterate_user_repositories`.
+
+    :returns: List of repository dictionaries.
+    """
+    return [repo async for repo in iterate_user_repositories()]
 
 
-async def get_waka_time_stats(repositories: Dict, commit_dates: Dict) -> str:
-    stats = str()
-    data = await DM.get_remote_json("waka_stats")
+async def get_stats() -> str:
+    repositories = list()
+    yearly_data, commit_data, rollup_data = await calculate_commit_data(iterate_user_repositories(repositories))
+    PM.checkpoint("Repositories discovery and commit data calculation")
+    stats = await assemble_stats(repositories, yearly_data, commit_data, rollup_data)
+    PM.checkpoint("Stats assembly")
+    return stats
 
-    commit_list = await make_commit_day_time_list(data['data']['timezone'], repositories, commit_dates)
-    stats += f"{commit_list}\n\n"
 
-    stats += "📊 **I have spent time on** \n\n```text\n"
+async def render_commit_day_time(waka_stats: Optional[Dict], repositories: List[Dict], commit_data: Dict) -> str:
+    time_zone = "UTC" if waka_stats is None else waka_stats["timezone"]
+    commit_list = await make_commit_day_time_list(time_zone, repositories, commit_data)
+    return f"{commit_list}\n\n"
 
-    lang_list = make_list(data["data"]["languages"])
-    stats += f"📚 Languages: \n{lang_list}\n\n"
 
-    edit_list = make_list(data["data"]["editors"])
-    stats += f"📑 Editors: \n{edit_list}\n\n"
+async def render_commit_windows(waka_stats: Optional[Dict], rollup_data: Dict, hour: str) -> str:
+    # `hour` isn't used for rendering, it expires cached windows as time passes.
+    stats = str()
+    time_zone = "UTC" if waka_stats is None else waka_stats["timezone"]
+    for days in EM.COMMIT_WINDOWS:
+        window_list = await make_commit_window_list(time_zone, rollup_data, days)
+        stats += f"{window_list}\n\n"
+    return stats
 
-    os_list = make_list(data["data"]["operating_systems"])
-    stats += f"💻 Operating Systems: \n{os_list}\n\n"
 
-    return f"{stats[:-1]}```\n\n"
+async def render_waka_time(waka_stats: Optional[Dict]) -> str:
+    if waka_stats is None:
+        DBM.w("WakaTime stats unavailable, skipping time spent section.")
+        return str()
 
+    lists = list()
+    if EM.SHOW_LANGUAGE:
+        lists += [f"📚 Languages: \n{make_list(waka_stats['languages'])}\n"]
+    if EM.SHOW_EDITORS:
+        lists += [f"📑 Editors: \n{make_list(waka_stats['editors'])}\n"]
+    if EM.SHOW_OS:
+        lists += [f"💻 Operating Systems: \n{make_list(waka_stats['operating_systems'])}\n"]
+    lists_text = "\n".join(lists)
+    since = "" if waka_stats["since"] is None else f"(since {waka_stats['since']}) "
+    return f"📊 **I have spent time on** {since}\n\n```text\n{lists_text}```\n\n"
 
-async def collect_user_repositories() -> Dict:
-    repositories = await DM.get_remote_graphql("user_repository_list", username=GHM.USER.login, id=GHM.USER.node_id)
-    repo_names = [repo["name"] for repo in repositories]
-    DBM.g("\tUser repository list collected!")
 
-    contributed = await DM.get_remote_graphql("repos_contributed_to", username=GHM.USER.login)
+async def render_language_per_repo(repositories: List[Dict]) -> str:
+    return f"{make_language_per_repo_list(repositories)}\n\n"
 
-    contributed_nodes = [repo for repo in contributed if repo is not None and repo["name"] not in repo_names and not repo["isFork"]]
-    DBM.g("\tUser contributed to repository list collected!")
 
-    return repositories + contributed_nodes
+async def render_badges(waka_stats: Optional[Dict], yearly_data: Dict) -> str:
+    from humanize import intword
 
+    stats = "<div align='center'><samp></br>~~~</br></br></samp>"
 
-async def get_stats() -> str:
-    repositories = await collect_user_repositories()
-    yearly_data, commit_data = await calculate_commit_data(repositories)
-    stats = await get_waka_time_stats(repositories, commit_data)
+    if EM.SHOW_TOTAL_CODE_TIME and waka_stats is not None:
+        total_hours = int(waka_stats["total_seconds"] // 3600)
+        data = f"{intword(total_hours)} coding hours"
+        data += "" if waka_stats["since"] is None else f" since {waka_stats['since']}".replace("-", "--")  # Dashes are escaped in badge text.
+        stats += f"<img src='http://img.shields.io/badge/{quote(data)}-black?style=for-the-badge' /> "
 
-    # stats += f"{make_language_per_repo_list(repositories)}\n\n"
+    if EM.SHOW_LINES_OF_CODE:
+        total_loc = sum([yearly_data[y][q][d]["add"] for y in yearly_data.keys() for q in yearly_data[y].keys() for d in yearly_data[y][q].keys()])
+        data = f"{intword(total_loc)} lines of code"
+        stats += f"<img src='https://img.shields.io/badge/{quote(data)}-black?style=for-the-badge' />"
 
-    stats += "<div align='center'><samp></br>~~~</br></br></samp>"
+    return f"{stats}</div>\n\n"
 
-    total_time = await DM.get_remote_json("waka_all")
-    total_hours = int(total_time['data']['text'].split(" ")[0].replace(",", ""))
-    data = f"{intword(total_hours)} coding hours"
-    stats += f"<img src='http://img.shields.io/badge/{quote(data)}-black?style=for-the-badge' /> "
 
-    total_loc = sum([yearly_data[y][q][d]["add"] for y in yearly_data.keys() for q in yearly_data[y].keys() for d in yearly_data[y][q].keys()])
-    data = f"{intword(total_loc)} lines of code"
-    stats += f"<img src='https://img.shields.io/badge/{quote(data)}-black?style=for-the-badge' />"
+async def render_loc_chart(yearly_data: Dict) -> str:
+    graph_path = get_graph_path()
+    updated = await create_loc_graph(yearly_data, graph_path)
+    return GHM.update_chart("Lines of Code", graph_path, updated)
 
-    stats += "</div>\n\n"
 
-    # data = GHM.REMOTE.get_views_traffic()
-    # stats += f"![Profile views](http://img.shields.io/badge/'Profile views-{data['count']}-blue)\n\n"
+SECTIONS = [  # README sections, in the order they appear in.
+    Section("commit_day_time", lambda: EM.SHOW_COMMIT or EM.SHOW_DAYS_OF_WEEK, ["waka_stats", "repositories", "commit_data"], render_commit_day_time),
+    Section("commit_windows", lambda: len(EM.COMMIT_WINDOWS) > 0, ["waka_stats", "rollup_data", "hour"], render_commit_windows),
+    Section("waka_time", lambda: EM.SHOW_LANGUAGE or EM.SHOW_EDITORS or EM.SHOW_OS, ["waka_stats"], render_waka_time),
+    Section("language_per_repo", lambda: EM.SHOW_LANGUAGE_PER_REPO, ["repositories"], render_language_per_repo),
+    Section("badges", lambda: EM.SHOW_TOTAL_CODE_TIME or EM.SHOW_LINES_OF_CODE, ["waka_stats", "yearly_data"], render_badges),
+    Section("loc_chart", lambda: EM.SHOW_LOC_CHART, ["yearly_data"], render_loc_chart, cached=False),
+]
 
-    return stats
+
+async def assemble_stats(repositories: List[Dict], yearly_data: Dict, commit_data: Dict, rollup_data: Dict) -> str:
+    """
+    Render README stats from already collected repositories and commit aggregates.
+    Only enabled sections are rendered, see `SECTIONS`.
+
+    :param repositories: User repositories info dictionary.
+    :param yearly_data: Commit quarter yearly data dictionary.
+    :param commit_data: Commit date dictionary.
+    :param rollup_data: Commit rollup data dictionary.
+    :returns: String representation of README stats.
+    """
+    inputs = {
+        "repositories": repositories,
+        "yearly_data": yearly_data,
+        "commit_data": commit_data,
+        "rollup_data": rollup_data,
+        "waka_stats": WM.get_stats,
+        "hour": datetime.utcnow().strftime("%Y-%m-%dT%H"),
+    }
+    return await SectionRenderer.render(SECTIONS, inputs)
 
 
 async def main():
     init_github_manager()
     await init_download_manager(GHM.USER.login)
+    await init_wakatime_manager()
+    PM.checkpoint("Initialization")
 
     stats = await get_stats()
 
@@ -86,14 +188,21 @@ async def main():
         GHM.commit_update()
     else:
         GHM.set_github_output(stats)
+    WM.close()
     await DM.close_remote_resources()
+    PM.checkpoint("Readme update")
 
 
 if __name__ == "__main__":
+    init_environment_manager()
     init_debug_manager()
     start_time = datetime.now()
     DBM.g("Program execution started at $date.", date=start_time)
-    run(main())
+    init_profile_manager()
+    try:
+        run(main())
+    finally:
+        PM.finish()
     end_time = datetime.now()
     DBM.g("Program execution finished at $date.", date=end_time)
     DBM.p("Program finished in $time.", time=end_time - start_time)
@@ -3,8 +3,6 @@ from logging import getLogger, Logger, StreamHandler
 from string import Template
 from typing import Dict
 
-from humanize import precisedelta
-
 from manager_environment import EnvironmentManager as EM
 
 
@@ -40,6 +38,8 @@ class DebugManager:
         if DebugManager._DATE_TEMPLATE in kwargs:
             kwargs[DebugManager._DATE_TEMPLATE] = f"{datetime.strftime(kwargs[DebugManager._DATE_TEMPLATE], '%d-%m-%Y %H:%M:%S:%f')}"
         if DebugManager._TIME_TEMPLATE in kwargs:
+            from humanize import precisedelta
+
             kwargs[DebugManager._TIME_TEMPLATE] = precisedelta(kwargs[DebugManager._TIME_TEMPLATE], minimum_unit="microseconds")
 
         return Template(message).substitute(kwargs)
@@ -1,17 +1,22 @@
-from asyncio import Task
+from asyncio import Task, sleep
 from hashlib import md5
 from json import dumps
 from string import Template
-from typing import Awaitable, Dict, Callable, Optional, List, Tuple
+from time import time
+from typing import AsyncIterator, Awaitable, Dict, Callable, Optional, List, Tuple
 
-from httpx import AsyncClient
-from yaml import safe_load
+from httpx import AsyncClient, Response
 
 from manager_environment import EnvironmentManager as EM
 from manager_debug import DebugManager as DBM
 
+
+GRAPHQL_RETRIES = 10  # Number of times failed (with 502 status code) or rate limited GitHub GraphQL API query is retried.
+RATE_LIMIT_INITIAL_DELAY = 60  # Seconds to wait before retrying rate limited query for the first time, if GitHub doesn't specify it.
+RATE_LIMIT_MAX_DELAY = 900  # Maximum seconds to wait before retrying rate limited query, if GitHub doesn't specify it.
+
 GITHUB_API_QUERIES = {
-    # Query to collect info about all user repositories, including: is it a fork, name and owner login.
+    # Query to collect info about all user repositories, including: is it a fork, name, owner login and size hints.
     # NB! Query includes information about recent repositories only (apparently, contributed within a year).
     "repos_contributed_to": """
 {
@@ -27,6 +32,20 @@ GITHUB_API_QUERIES = {
                 }
                 isPrivate
                 isFork
+                pushedAt
+                diskUsage
+                refs(refPrefix: "refs/heads/") {
+                    totalCount
+                }
+                defaultBranchRef {
+                    target {
+                        ... on Commit {
+                            history {
+                                totalCount
+                            }
+                        }
+                    }
+                }
             }
             pageInfo {
                 endCursor
@@ -35,7 +54,7 @@ GITHUB_API_QUERIES = {
         }
     }
 }""",
-    # Query to collect info about all repositories user created or collaborated on, including: name, primary language and owner login.
+    # Query to collect info about all repositories user created or collaborated on, including: name, primary language, owner login and size hints.
     # NB! Query doesn't include information about repositories user contributed to via pull requests.
     "user_repository_list": """
 {
@@ -50,6 +69,20 @@ GITHUB_API_QUERIES = {
                     login
                 }
                 isPrivate
+                pushedAt
+                diskUsage
+                refs(refPrefix: "refs/heads/") {
+                    totalCount
+                }
+                defaultBranchRef {
+                    target {
+                        ... on Commit {
+                            history {
+                                totalCount
+                            }
+                        }
+                    }
+                }
             }
             pageInfo {
                 endCursor
@@ -58,6 +91,37 @@ GITHUB_API_QUERIES = {
         }
     }
 }
+""",
+    # Query to collect years user has contributed in.
+    "user_contribution_years": """
+{
+    user(login: "$username") {
+        contributionsCollection {
+            contributionYears
+        }
+    }
+}
+""",
+    # Query to collect info about repositories user committed to in the given time range (one year at most), including: name, owner login and commit count.
+    # NB! Query includes commits to default branches only, returns 100 repositories at most.
+    "user_repository_contributions": """
+{
+    user(login: "$username") {
+        contributionsCollection(from: "$start", to: "$end") {
+            commitContributionsByRepository(maxRepositories: 100) {
+                repository {
+                    name
+                    owner {
+                        login
+                    }
+                }
+                contributions {
+                    totalCount
+                }
+            }
+        }
+    }
+}
 """,
     # Query to collect info about branches in the given repository, including: names.
     "repo_branch_list": """
@@ -123,8 +187,6 @@ async def init_download_manager(user_login: str):
     """
     await DownloadManager.load_remote_resources(
         linguist="https://cdn.jsdelivr.net/gh/github/linguist@master/lib/linguist/languages.yml",
-        waka_stats=f"https://wakatime.com/api/v1/users/current/stats/all_time?api_key={EM.WAKATIME_API_KEY}",
-        waka_all=f"https://wakatime.com/api/v1/users/current/all_time_since_today?api_key={EM.WAKATIME_API_KEY}",
         github_stats=f"https://github-contributions.vercel.app/api/v1/{user_login}",
     )
 
@@ -134,7 +196,7 @@ class DownloadManager:
     Class for handling and caching all kinds of requests.
     There considered to be two types of queries:
     - Static queries: queries that don't require many arguments that should be executed once
-      Example: queries to WakaTime API or to GitHub linguist
+      Example: queries to GitHub linguist
     - Dynamic queries: queries that require many arguments and should be executed multiple times
       Example: GraphQL queries to GitHub API
     DownloadManager launches all static queries asynchronously upon initialization and caches their results.
@@ -207,6 +269,24 @@ class DownloadManager:
         """
         return await DownloadManager._get_remote_resource(resource, None)
 
+    @staticmethod
+    async def get_remote_json_once(url: str, unavailable_codes: Tuple[int, ...] = ()) -> Dict or None:
+        """
+        Execute web query without caching and return JSON response data.
+        :param url: Query URL.
+        :param unavailable_codes: Status codes meaning the resource is unavailable (e.g. beyond account plan limits) rather than query failure.
+        :return: Response JSON dictionary, empty dictionary if the resource is unavailable or None if the resource is not ready yet (201 or 202 status code).
+        """
+        res = await DownloadManager._client.get(url)
+        if res.status_code == 200:
+            return res.json()
+        elif res.status_code in (201, 202):
+            return None
+        elif res.status_code in unavailable_codes:
+            return dict()
+        else:
+            raise Exception(f"Query '{res.url.copy_remove_param('api_key')}' failed to run by returning code of {res.status_code}: {res.text}")
+
     @staticmethod
     async def get_remote_yaml(resource: str) -> Dict or None:
         """
@@ -214,13 +294,17 @@ class DownloadManager:
         :param resource: Static query identifier.
         :return: Response YAML dictionary.
         """
+        from yaml import safe_load
+
         return await DownloadManager._get_remote_resource(resource, safe_load)
 
     @staticmethod
-    async def _fetch_graphql_query(query: str, retries_count: int = 10, **kwargs) -> Dict:
+    async def _fetch_graphql_query(query: str, retries_count: int = GRAPHQL_RETRIES, **kwargs) -> Dict:
         """
         Execute GitHub GraphQL API simple query.
+        Queries failed with 502 status code are retried right away, rate limited queries are retried after delay, see `_rate_limit_delay`.
         :param query: Dynamic query identifier.
+        :param retries_count: Number of retries left.
         :param use_github_action: Use GitHub actions bot auth token instead of current user.
         :param kwargs: Parameters for substitution of variables in dynamic query.
         :return: Response JSON dictionary.
@@ -233,9 +317,41 @@ class DownloadManager:
             return res.json()
         elif res.status_code == 502 and retries_count > 0:
             return await DownloadManager._fetch_graphql_query(query, retries_count - 1, **kwargs)
+        elif res.status_code in (403, 429) and retries_count > 0 and DownloadManager._is_rate_limited(res):
+            delay = DownloadManager._rate_limit_delay(res, retries_count)
+            DBM.w(f"\tQuery '{query}' was rate limited, retrying in {delay} seconds...")
+            await sleep(delay)
+            return await DownloadManager._fetch_graphql_query(query, retries_count - 1, **kwargs)
         else:
             raise Exception(f"Query '{query}' failed to run by returning code of {res.status_code}: {res.json()}")
 
+    @staticmethod
+    def _is_rate_limited(res: Response) -> bool:
+        """
+        Check if GitHub API response was rejected by primary or secondary rate limit (not by lack of permissions).
+        :param res: Response with 403 or 429 status code.
+        :return: True if the request can be retried later, false otherwise.
+        """
+        if res.status_code == 429 or "retry-after" in res.headers or res.headers.get("x-ratelimit-remaining") == "0":
+            return True
+        return "rate limit" in res.text.lower()
+
+    @staticmethod
+    def _rate_limit_delay(res: Response, retries_count: int) -> int:
+        """
+        Get number of seconds to wait before retrying rate limited GitHub API query.
+        `Retry-After` header is honoured, then the primary rate limit reset time.
+        Otherwise exponential backoff is used, from `RATE_LIMIT_INITIAL_DELAY` to `RATE_LIMIT_MAX_DELAY`.
+        :param res: Rate limited response.
+        :param retries_count: Number of retries left.
+        :return: Delay in seconds.
+        """
+        if "retry-after" in res.headers:
+            return int(res.headers["retry-after"])
+        elif res.headers.get("x-ratelimit-remaining") == "0" and "x-ratelimit-reset" in res.headers:
+            return max(int(res.headers["x-ratelimit-reset"]) - int(time()), 0) + 1
+        return min(RATE_LIMIT_INITIAL_DELAY * 2 ** max(GRAPHQL_RETRIES - retries_count, 0), RATE_LIMIT_MAX_DELAY)
+
     @staticmethod
     def _find_pagination_and_data_list(response: Dict) -> Tuple[List, Dict]:
         """
@@ -270,15 +386,49 @@ class DownloadManager:
         :param kwargs: Parameters for substitution of variables in dynamic query.
         :return: Response JSON dictionary.
         """
-        initial_query_response = await DownloadManager._fetch_graphql_query(query, **kwargs, pagination="first: 100")
-        page_list, page_info = DownloadManager._find_pagination_and_data_list(initial_query_response)
-        while page_info["hasNextPage"]:
-            pagination = f'first: 100, after: "{page_info["endCursor"]}"'
-            query_response = await DownloadManager._fetch_graphql_query(query, **kwargs, pagination=pagination)
-            new_page_list, page_info = DownloadManager._find_pagination_and_data_list(query_response)
+        page_list = list()
+        async for new_page_list, _ in DownloadManager.iterate_remote_graphql_pages(query, **kwargs):
             page_list += new_page_list
         return page_list
 
+    @staticmethod
+    async def iterate_remote_graphql_pages(query: str, after: Optional[str] = None, **kwargs) -> AsyncIterator[Tuple[List, Dict]]:
+        """
+        Execute GitHub GraphQL API paginated query page by page, without caching.
+        Queries 100 new results each time until no more results are left.
+        :param query: Dynamic query identifier.
+        :param after: Cursor to start pagination after, pagination starts from the first result if None.
+        :param kwargs: Parameters for substitution of variables in dynamic query.
+        :return: Iterator of the acquired pagination data lists and pagination info dicts.
+        """
+        while True:
+            pagination = "first: 100" if after is None else f'first: 100, after: "{after}"'
+            query_response = await DownloadManager._fetch_graphql_query(query, **kwargs, pagination=pagination)
+            page_list, page_info = DownloadManager._find_pagination_and_data_list(query_response)
+            yield page_list, page_info
+            if not page_info["hasNextPage"]:
+                break
+            after = page_info["endCursor"]
+
+    @staticmethod
+    def _graphql_cache_key(query: str, **kwargs) -> str:
+        """
+        Create cache identifier of GitHub GraphQL API query: query identifier + parameters hash.
+        :param query: Dynamic query identifier.
+        :param kwargs: Parameters for substitution of variables in dynamic query.
+        :return: Cache identifier string.
+        """
+        return f"{query}_{md5(dumps(kwargs, sort_keys=True).encode('utf-8')).digest()}"
+
+    @staticmethod
+    def invalidate_remote_graphql(query: str, **kwargs):
+        """
+        Drop cached result of GitHub GraphQL API query, so that it is executed again upon next request.
+        :param query: Dynamic query identifier.
+        :param kwargs: Parameters for substitution of variables in dynamic query.
+        """
+        DownloadManager._REMOTE_RESOURCES_CACHE.pop(DownloadManager._graphql_cache_key(query, **kwargs), None)
+
     @staticmethod
     async def get_remote_graphql(query: str, **kwargs) -> Dict:
         """
@@ -291,7 +441,7 @@ class DownloadManager:
         :param kwargs: Parameters for substitution of variables in dynamic query.
         :return: Response JSON dictionary.
         """
-        key = f"{query}_{md5(dumps(kwargs, sort_keys=True).encode('utf-8')).digest()}"
+        key = DownloadManager._graphql_cache_key(query, **kwargs)
         if key not in DownloadManager._REMOTE_RESOURCES_CACHE:
             if "$pagination" in GITHUB_API_QUERIES[query]:
                 res = await DownloadManager._fetch_graphql_paginated(query, **kwargs)
@@ -1,4 +1,18 @@
-from os import getenv, environ
+from os import getenv
+from os.path import join
+from typing import Callable, List, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+def init_environment_manager():
+    """
+    Initialize environment manager:
+    - Parse all environmental variables used by the action (once).
+    - Validate parsed values.
+    """
+    EnvironmentManager.load()
 
 
 class EnvironmentManager:
@@ -8,43 +22,181 @@ class EnvironmentManager:
     The others have a provided default value.
     For all boolean variables a 'truthy'-list is checked (not only true/false, but also 1, t, y and yes are accepted).
     List variable `IGNORED_REPOS` is split and parsed.
-    Integer variable `SYMBOL_VERSION` is parsed.
+    Integer variable `SYMBOL_VERSION` and integer list variable `COMMIT_WINDOWS` are parsed.
+    Variables prefixed with `DAEMON_` are used by long-running service mode (`daemon.py`) only.
+    Relative `CACHE_DIR` path is resolved against GitHub workspace (when run as an action), so that it can be persisted with `actions/cache`.
+    Variables are parsed and validated upon `init_environment_manager` call, all errors are reported at once.
     """
 
     _TRUTHY = ["true", "1", "t", "y", "yes"]
+    _SYMBOL_VERSIONS = [1, 2, 3]
+    _CHART_BACKENDS = ["matplotlib", "svg"]
+
+    _LOADED = False
+    _ERRORS: List[str] = list()
+
+    GH_TOKEN: str
+    WAKATIME_API_KEY: str
+
+    SECTION_NAME: str
+    PULL_BRANCH_NAME: str
+    PUSH_BRANCH_NAME: str
+
+    SHOW_OS: bool
+    SHOW_PROJECTS: bool
+    SHOW_EDITORS: bool
+    SHOW_TIMEZONE: bool
+    SHOW_COMMIT: bool
+    SHOW_LANGUAGE: bool
+    SHOW_LINES_OF_CODE: bool
+    SHOW_LANGUAGE_PER_REPO: bool
+    SHOW_LOC_CHART: bool
+    SHOW_DAYS_OF_WEEK: bool
+    SHOW_PROFILE_VIEWS: bool
+    SHOW_SHORT_INFO: bool
+    SHOW_UPDATED_DATE: bool
+    SHOW_TOTAL_CODE_TIME: bool
+
+    COMMIT_BY_ME: bool
+    COMMIT_MESSAGE: str
+    COMMIT_USERNAME: str
+    COMMIT_EMAIL: str
+    COMMIT_SINGLE: bool
+
+    LOCALE: str
+    UPDATED_DATE_FORMAT: str
+    IGNORED_REPOS: List[str]
+    SYMBOL_VERSION: int
+    CHART_BACKEND: str
+    COMMIT_WINDOWS: List[int]
+    WAKATIME_DEADLINE: float
+    CACHE_DIR: str
+
+    DEBUG_LOGGING: bool
+    DEBUG_RUN: bool
+    PROFILING: bool
+
+    DAEMON_PORT: int
+    DAEMON_EVENTS_DIR: str
+    DAEMON_DEBOUNCE: float
+    DAEMON_WEBHOOK_SECRET: str
+
+    @staticmethod
+    def _required(name: str) -> str:
+        """
+        Read required variable, record error if it is missing.
+
+        :param name: Environmental variable name.
+        :returns: Variable value or empty string.
+        """
+        value = getenv(name, "")
+        if value == "":
+            EnvironmentManager._ERRORS += [f"'{name}' is required"]
+        return value
+
+    @staticmethod
+    def _truthy(name: str, default: str) -> bool:
+        """
+        Read boolean variable.
+
+        :param name: Environmental variable name.
+        :param default: Default variable value.
+        :returns: True if the value is in 'truthy'-list, false otherwise.
+        """
+        return getenv(name, default).lower() in EnvironmentManager._TRUTHY
+
+    @staticmethod
+    def _parsed(name: str, default: str, parser: Callable[[str], T], choices: Optional[List] = None) -> T:
+        """
+        Read and parse variable, record error if it can't be parsed or isn't one of the allowed choices.
+
+        :param name: Environmental variable name.
+        :param default: Default variable value.
+        :param parser: Function converting string value.
+        :param choices: Allowed parsed values, any values are allowed if None.
+        :returns: Parsed variable value or parsed default value if the variable is invalid.
+        """
+        value = getenv(name, default)
+        try:
+            parsed = parser(value)
+        except ValueError:
+            EnvironmentManager._ERRORS += [f"'{name}' can't be parsed from '{value}'"]
+            return parser(default)
+        if choices is not None and parsed not in choices:
+            EnvironmentManager._ERRORS += [f"'{name}' should be one of {choices}, not '{value}'"]
+            return parser(default)
+        return parsed
+
+    @staticmethod
+    def _positive_list(value: str) -> List[int]:
+        """
+        Parse comma separated list of positive integers.
+
+        :param value: Variable value.
+        :returns: List of integers.
+        """
+        numbers = [int(number) for number in value.replace(" ", "").split(",") if number != ""]
+        if any(number <= 0 for number in numbers):
+            raise ValueError("Numbers should be positive")
+        return numbers
+
+    @staticmethod
+    def load():
+        """
+        Parse and validate all environmental variables, unless they were loaded already.
+        Raises exception listing all invalid variables.
+        """
+        if EnvironmentManager._LOADED:
+            return
+        EM = EnvironmentManager
+        EM._ERRORS = list()
+
+        EM.GH_TOKEN = EM._required("INPUT_GH_TOKEN")
+        EM.WAKATIME_API_KEY = EM._required("INPUT_WAKATIME_API_KEY")
+
+        EM.SECTION_NAME = getenv("INPUT_SECTION_NAME", "waka")
+        EM.PULL_BRANCH_NAME = getenv("INPUT_PULL_BRANCH_NAME", "")
+        EM.PUSH_BRANCH_NAME = getenv("INPUT_PUSH_BRANCH_NAME", "")
+
+        EM.SHOW_OS = EM._truthy("INPUT_SHOW_OS", "True")
+        EM.SHOW_PROJECTS = EM._truthy("INPUT_SHOW_PROJECTS", "True")
+        EM.SHOW_EDITORS = EM._truthy("INPUT_SHOW_EDITORS", "True")
+        EM.SHOW_TIMEZONE = EM._truthy("INPUT_SHOW_TIMEZONE", "True")
+        EM.SHOW_COMMIT = EM._truthy("INPUT_SHOW_COMMIT", "True")
+        EM.SHOW_LANGUAGE = EM._truthy("INPUT_SHOW_LANGUAGE", "True")
+        EM.SHOW_LINES_OF_CODE = EM._truthy("INPUT_SHOW_LINES_OF_CODE", "True")
+        EM.SHOW_LANGUAGE_PER_REPO = EM._truthy("INPUT_SHOW_LANGUAGE_PER_REPO", "False")
+        EM.SHOW_LOC_CHART = EM._truthy("INPUT_SHOW_LOC_CHART", "False")
+        EM.SHOW_DAYS_OF_WEEK = EM._truthy("INPUT_SHOW_DAYS_OF_WEEK", "True")
+        EM.SHOW_PROFILE_VIEWS = EM._truthy("INPUT_SHOW_PROFILE_VIEWS", "True")
+        EM.SHOW_SHORT_INFO = EM._truthy("INPUT_SHOW_SHORT_INFO", "True")
+        EM.SHOW_UPDATED_DATE = EM._truthy("INPUT_SHOW_UPDATED_DATE", "True")
+        EM.SHOW_TOTAL_CODE_TIME = EM._truthy("INPUT_SHOW_TOTAL_CODE_TIME", "True")
+
+        EM.COMMIT_BY_ME = EM._truthy("INPUT_COMMIT_BY_ME", "False")
+        EM.COMMIT_MESSAGE = getenv("INPUT_COMMIT_MESSAGE", "Updated with Dev Metrics")
+        EM.COMMIT_USERNAME = getenv("INPUT_COMMIT_USERNAME", "")
+        EM.COMMIT_EMAIL = getenv("INPUT_COMMIT_EMAIL", "")
+        EM.COMMIT_SINGLE = EM._truthy("INPUT_COMMIT_SINGLE", "")
+
+        EM.LOCALE = getenv("INPUT_LOCALE", "en")
+        EM.UPDATED_DATE_FORMAT = getenv("INPUT_UPDATED_DATE_FORMAT", "%d/%m/%Y %H:%M:%S")
+        EM.IGNORED_REPOS = getenv("INPUT_IGNORED_REPOS", "").replace(" ", "").split(",")
+        EM.SYMBOL_VERSION = EM._parsed("INPUT_SYMBOL_VERSION", "1", int, EM._SYMBOL_VERSIONS)
+        EM.CHART_BACKEND = EM._parsed("INPUT_CHART_BACKEND", "matplotlib", str.lower, EM._CHART_BACKENDS)
+        EM.COMMIT_WINDOWS = EM._parsed("INPUT_COMMIT_WINDOWS", "", EM._positive_list)
+        EM.WAKATIME_DEADLINE = EM._parsed("INPUT_WAKATIME_DEADLINE", "120", float)
+        EM.CACHE_DIR = getenv("INPUT_CACHE_DIR", "") and join(getenv("GITHUB_WORKSPACE", ""), getenv("INPUT_CACHE_DIR"))
+
+        EM.DEBUG_LOGGING = EM._truthy("INPUT_DEBUG_LOGGING", "0")
+        EM.DEBUG_RUN = EM._truthy("DEBUG_RUN", "False")
+        EM.PROFILING = EM._truthy("INPUT_PROFILING", "False")
+
+        EM.DAEMON_PORT = EM._parsed("DAEMON_PORT", "8080", int)
+        EM.DAEMON_EVENTS_DIR = getenv("DAEMON_EVENTS_DIR", "")
+        EM.DAEMON_DEBOUNCE = EM._parsed("DAEMON_DEBOUNCE", "30", float)
+        EM.DAEMON_WEBHOOK_SECRET = getenv("DAEMON_WEBHOOK_SECRET", "")
 
-    GH_TOKEN = environ["INPUT_GH_TOKEN"]
-    WAKATIME_API_KEY = environ["INPUT_WAKATIME_API_KEY"]
-
-    SECTION_NAME = getenv("INPUT_SECTION_NAME", "waka")
-    PULL_BRANCH_NAME = getenv("INPUT_PULL_BRANCH_NAME", "")
-    PUSH_BRANCH_NAME = getenv("INPUT_PUSH_BRANCH_NAME", "")
-
-    SHOW_OS = getenv("INPUT_SHOW_OS", "False").lower() in _TRUTHY
-    SHOW_PROJECTS = getenv("INPUT_SHOW_PROJECTS", "True").lower() in _TRUTHY
-    SHOW_EDITORS = getenv("INPUT_SHOW_EDITORS", "True").lower() in _TRUTHY
-    SHOW_TIMEZONE = getenv("INPUT_SHOW_TIMEZONE", "True").lower() in _TRUTHY
-    SHOW_COMMIT = getenv("INPUT_SHOW_COMMIT", "True").lower() in _TRUTHY
-    SHOW_LANGUAGE = getenv("INPUT_SHOW_LANGUAGE", "True").lower() in _TRUTHY
-    SHOW_LINES_OF_CODE = getenv("INPUT_SHOW_LINES_OF_CODE", "False").lower() in _TRUTHY
-    SHOW_LANGUAGE_PER_REPO = getenv("INPUT_SHOW_LANGUAGE_PER_REPO", "True").lower() in _TRUTHY
-    SHOW_LOC_CHART = getenv("INPUT_SHOW_LOC_CHART", "True").lower() in _TRUTHY
-    SHOW_DAYS_OF_WEEK = getenv("INPUT_SHOW_DAYS_OF_WEEK", "True").lower() in _TRUTHY
-    SHOW_PROFILE_VIEWS = getenv("INPUT_SHOW_PROFILE_VIEWS", "True").lower() in _TRUTHY
-    SHOW_SHORT_INFO = getenv("INPUT_SHOW_SHORT_INFO", "True").lower() in _TRUTHY
-    SHOW_UPDATED_DATE = getenv("INPUT_SHOW_UPDATED_DATE", "True").lower() in _TRUTHY
-    SHOW_TOTAL_CODE_TIME = getenv("INPUT_SHOW_TOTAL_CODE_TIME", "True").lower() in _TRUTHY
-
-    COMMIT_BY_ME = getenv("INPUT_COMMIT_BY_ME", "False").lower() in _TRUTHY
-    COMMIT_MESSAGE = getenv("INPUT_COMMIT_MESSAGE", "Updated with Dev Metrics")
-    COMMIT_USERNAME = getenv("INPUT_COMMIT_USERNAME", "")
-    COMMIT_EMAIL = getenv("INPUT_COMMIT_EMAIL", "")
-    COMMIT_SINGLE = getenv("INPUT_COMMIT_SINGLE", "").lower() in _TRUTHY
-
-    LOCALE = getenv("INPUT_LOCALE", "en")
-    UPDATED_DATE_FORMAT = getenv("INPUT_UPDATED_DATE_FORMAT", "%d/%m/%Y %H:%M:%S")
-    IGNORED_REPOS = getenv("INPUT_IGNORED_REPOS", "").replace(" ", "").split(",")
-    SYMBOL_VERSION = int(getenv("INPUT_SYMBOL_VERSION"))
-
-    DEBUG_LOGGING = getenv("INPUT_DEBUG_LOGGING", "0").lower() in _TRUTHY
-    DEBUG_RUN = getenv("DEBUG_RUN", "False").lower() in _TRUTHY
+        if len(EM._ERRORS) > 0:
+            raise Exception(f"Invalid environmental variables: {', '.join(EM._ERRORS)}!")
+        EM._LOADED = True
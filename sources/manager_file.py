@@ -1,14 +1,25 @@
+from array import array
+from mmap import mmap, ACCESS_READ
+from os import makedirs, replace
 from os.path import join, isfile, dirname
-from pickle import load as load_pickle, dump as dump_pickle
 from json import load as load_json
-from typing import Dict, Optional, Any
+from struct import Struct
+from typing import Dict, List, Optional
+from zlib import crc32
 
 from manager_environment import EnvironmentManager as EM
+from manager_debug import DebugManager as DBM
+
+
+_MAGIC = b"WRSC"  # Binary cache file magic bytes.
+_VERSION = 1  # Binary cache file format version, should be increased on every layout change.
+_HEADER = Struct("<4sHH")  # Binary cache file header: magic bytes, format version, number of sections.
+_SECTION = Struct("<16sc3xQQI")  # Binary cache section table entry: name, array typecode, offset, length, CRC32 checksum.
 
 
 class FileManager:
     """
-    Class for handling localization (and maybe other file IO in future).
+    Class for handling localization and other file IO: output files and binary caches.
     Stores localization in dictionary.
     """
 
@@ -36,6 +47,19 @@ class FileManager:
         """
         return FileManager._LOCALIZATION[key]
 
+    @staticmethod
+    def cache_path(name: str) -> str:
+        """
+        Get path of file that should be kept between runs, in `CACHE_DIR` directory ('assets' directory if it isn't set).
+        The directory is created if it doesn't exist.
+
+        :param name: File name.
+        :returns: File path.
+        """
+        directory = EM.CACHE_DIR or FileManager.ASSETS_DIR
+        makedirs(directory, exist_ok=True)
+        return join(directory, name)
+
     @staticmethod
     def write_file(name: str, content: str, append: bool = False, assets: bool = False):
         """
@@ -51,25 +75,96 @@ class FileManager:
             file.write(content)
 
     @staticmethod
-    def cache_binary(name: str, content: Optional[Any] = None, assets: bool = False) -> Optional[Any]:
+    def cache_binary(
+        name: str, content: Optional[Dict[str, array]] = None, assets: bool = False, sections: Optional[List[str]] = None
+    ) -> Optional[Dict[str, memoryview]]:
         """
         Save binary output file if provided or read if content is None.
+        File consists of named typed sections (arrays), its layout is:
+        - Header: magic bytes, format version and number of sections.
+        - Section table: name, array typecode, offset, length and CRC32 checksum of each section.
+        - Section data, each section aligned to 8 bytes.
+        File is memory-mapped upon reading, sections are returned as typed memoryviews without copying.
+        Only checksums of the requested sections are verified.
 
         :param name: File name.
-        :param content: File content (utf-8 string) or None.
+        :param content: File content (dictionary of section names and arrays) or None.
         :param assets: True for saving to 'assets' directory, false otherwise.
-        :returns: File cache contents if content is None, None otherwise.
+        :param sections: Names of sections to read, all sections are read if None.
+        :returns: File cache sections if content is None and file is valid, None otherwise.
         """
         name = join(FileManager.ASSETS_DIR, name) if assets else name
-        if content is None and not isfile(name):
+        if content is not None:
+            FileManager._write_sections(name, content)
+            return None
+        elif not isfile(name):
             return None
 
-        with open(name, "rb" if content is None else "wb") as file:
-            if content is None:
-                try:
-                    return load_pickle(file)
-                except Exception:
-                    return None
-            else:
-                dump_pickle(content, file)
-                return None
+        try:
+            with open(name, "rb") as file:
+                data = mmap(file.fileno(), 0, access=ACCESS_READ)
+            return FileManager._read_sections(data, sections)
+        except ValueError as e:
+            DBM.w(f"\tCache file '{name}' is invalid: {e}")
+            return None
+
+    @staticmethod
+    def _write_sections(name: str, content: Dict[str, array]):
+        """
+        Write sections to binary file, see `cache_binary` for file layout.
+        The file is written to temporary file next to it first and then replaces it, so that interrupted write never leaves it truncated.
+
+        :param name: File path.
+        :param content: Dictionary of section names and arrays.
+        """
+        offset = _HEADER.size + _SECTION.size * len(content)
+        table, payload = list(), list()
+        for section, values in content.items():
+            offset += -offset % 8
+            data = values.tobytes()
+            table += [_SECTION.pack(section.encode("utf-8"), values.typecode.encode("ascii"), offset, len(data), crc32(data))]
+            payload += [data]
+            offset += len(data)
+
+        temporary = f"{name}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(_HEADER.pack(_MAGIC, _VERSION, len(content)))
+            file.write(b"".join(table))
+            for data in payload:
+                file.write(b"\0" * (-file.tell() % 8))
+                file.write(data)
+        replace(temporary, name)
+
+    @staticmethod
+    def _read_sections(data: mmap, sections: Optional[List[str]]) -> Dict[str, memoryview]:
+        """
+        Read sections from memory-mapped binary file, see `cache_binary` for file layout.
+        Raises ValueError if file is truncated, has unsupported version or requested section is missing or corrupted.
+
+        :param data: Memory-mapped file.
+        :param sections: Names of sections to read, all sections are read if None.
+        :returns: Dictionary of section names and typed memoryviews.
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("file is truncated")
+        magic, version, count = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"unsupported format version {version}")
+        if len(data) < _HEADER.size + _SECTION.size * count:
+            raise ValueError("section table is truncated")
+
+        view, result = memoryview(data), dict()
+        for index in range(count):
+            section, typecode, offset, length, checksum = _SECTION.unpack_from(data, _HEADER.size + _SECTION.size * index)
+            section = section.rstrip(b"\0").decode("utf-8")
+            if sections is not None and section not in sections:
+                continue
+            end = offset + length
+            if end > len(data) or crc32(view[offset:end]) != checksum:
+                raise ValueError(f"section '{section}' is corrupted")
+            result[section] = view[offset:end].cast(typecode.decode("ascii"))
+
+        missing = set(sections or list()) - set(result.keys())
+        if len(missing) > 0:
+            raise ValueError(f"sections {', '.join(missing)} are missing")
+        return result
@@ -1,18 +1,20 @@
 from base64 import b64encode
 from os import environ, makedirs
-from os.path import dirname, join
+from os.path import dirname, isfile, join
 from random import choice
 from re import sub
 from shutil import copy, rmtree
 from string import ascii_letters
-
-from git import Repo, Actor
-from github import Github, AuthenticatedUser, Repository
+from typing import TYPE_CHECKING, List
 
 from manager_environment import EnvironmentManager as EM
 from manager_file import FileManager as FM
 from manager_debug import DebugManager as DBM
 
+if TYPE_CHECKING:
+    from git import Repo, Actor
+    from github import AuthenticatedUser, Repository
+
 
 def init_github_manager():
     """
@@ -24,18 +26,14 @@ def init_github_manager():
 
 
 class GitHubManager:
-    USER: AuthenticatedUser
-    REPO: Repo
-    REMOTE: Repository
+    USER: "AuthenticatedUser"
+    REPO: "Repo"
+    REMOTE: "Repository"
 
     _REMOTE_NAME: str
     _REMOTE_PATH: str
     _SINGLE_COMMIT_BRANCH = "latest_branch"
 
-    _START_COMMENT = f"<!--START_SECTION:{EM.SECTION_NAME}-->"
-    _END_COMMENT = f"<!--END_SECTION:{EM.SECTION_NAME}-->"
-    _README_REGEX = f"{_START_COMMENT}[\\s\\S]+{_END_COMMENT}"
-
     @staticmethod
     def prepare_github_env():
         """
@@ -44,6 +42,9 @@ class GitHubManager:
         - Named repo of the user [username]/[username].
         - Clone of the named repo.
         """
+        from git import Repo
+        from github import Github
+
         github = Github(EM.GH_TOKEN)
         clone_path = "repo"
         GitHubManager.USER = github.get_user()
@@ -54,26 +55,62 @@ class GitHubManager:
 
         GitHubManager.REMOTE = github.get_repo(GitHubManager._REMOTE_NAME)
         GitHubManager.REPO = Repo.clone_from(GitHubManager._REPO_PATH, to_path=clone_path)
+        GitHubManager.sync_repo(fetch=False)
+
+    @staticmethod
+    def sync_repo(fetch: bool = True):
+        """
+        Resets clone of the named repo to the state of the remote branch, discarding all local changes and commits.
+        If single commit is requested, the orphan branch is recreated from the pull branch, so that it always contains one commit.
+
+        :param fetch: True for fetching remote branches before reset, false if the clone was just made.
+        """
+        if fetch:
+            DBM.i("Synchronizing repo clone with remote...")
+            GitHubManager.REPO.remotes.origin.fetch()
 
+        branch = GitHubManager.branch(EM.PULL_BRANCH_NAME if EM.COMMIT_SINGLE else EM.PUSH_BRANCH_NAME)
+        GitHubManager.REPO.git.checkout("--force", "-B", branch, f"origin/{branch}")
+        GitHubManager.REPO.git.clean("-f", "-d")
         if EM.COMMIT_SINGLE:
-            GitHubManager.REPO.git.checkout(GitHubManager.branch(EM.PULL_BRANCH_NAME))
+            if GitHubManager._SINGLE_COMMIT_BRANCH in [head.name for head in GitHubManager.REPO.heads]:
+                GitHubManager.REPO.git.branch("-D", GitHubManager._SINGLE_COMMIT_BRANCH)
             GitHubManager.REPO.git.checkout("--orphan", GitHubManager._SINGLE_COMMIT_BRANCH)
-        else:
-            GitHubManager.REPO.git.checkout(GitHubManager.branch(EM.PUSH_BRANCH_NAME))
 
     @staticmethod
-    def _get_author() -> Actor:
+    def _get_author() -> "Actor":
         """
         Gets GitHub commit author specified by environmental variables.
         It is the user himself or a 'readme-bot'.
 
         :returns: Commit author.
         """
+        from git import Actor
+
         if EM.COMMIT_BY_ME:
             return Actor(EM.COMMIT_USERNAME or GitHubManager.USER.login, EM.COMMIT_EMAIL or GitHubManager.USER.email)
         else:
             return Actor(EM.COMMIT_USERNAME or "readme-bot", EM.COMMIT_EMAIL or "41898282+github-actions[bot]@users.noreply.github.com")
 
+    @staticmethod
+    def get_user_emails() -> List[str]:
+        """
+        Gets all known emails of the current user: public, GitHub noreply and private (if token has 'user:email' scope).
+
+        :returns: List of emails.
+        """
+        from github import GithubException
+
+        login = GitHubManager.USER.login
+        emails = {f"{GitHubManager.USER.id}+{login}@users.noreply.github.com", f"{login}@users.noreply.github.com"}
+        if GitHubManager.USER.email:
+            emails.add(GitHubManager.USER.email)
+        try:
+            emails |= {email.email for email in GitHubManager.USER.get_emails()}
+        except GithubException:
+            DBM.w("\tPrivate user emails are not available, only public and noreply emails are used.")
+        return sorted(emails)
+
     @staticmethod
     def branch(requested_branch: str) -> str:
         """
@@ -109,8 +146,9 @@ class GitHubManager:
 
         with open(readme_path, "r") as readme_file:
             readme_contents = readme_file.read()
-        readme_stats = f"{GitHubManager._START_COMMENT}\n{stats}\n{GitHubManager._END_COMMENT}"
-        new_readme = sub(GitHubManager._README_REGEX, readme_stats, readme_contents)
+        start_comment, end_comment = f"<!--START_SECTION:{EM.SECTION_NAME}-->", f"<!--END_SECTION:{EM.SECTION_NAME}-->"
+        readme_stats = f"{start_comment}\n{stats}\n{end_comment}"
+        new_readme = sub(f"{start_comment}[\\s\\S]+{end_comment}", readme_stats, readme_contents)
 
         with open(readme_path, "w") as readme_file:
             readme_file.write(new_readme)
@@ -119,29 +157,38 @@ class GitHubManager:
         DBM.g("README updated!")
 
     @staticmethod
-    def update_chart(name: str, path: str) -> str:
+    def update_chart(name: str, path: str, updated: bool = True) -> str:
         """
         Updates a chart.
         Inlines data into readme if in debug mode, commits otherwise.
         Uses commit author, commit message and branch name specified by environmental variables.
+        Chart isn't copied to repository if it wasn't updated and the repository already contains it.
+        Chart inputs hash file (if any) is copied along with the chart, so that the chart isn't rendered again until its inputs change.
 
         :param name: Name of the chart to update.
         :param path: Path of the chart to update.
+        :param updated: True if the chart file was rendered anew, false if previously rendered file was reused.
         :returns: String to add to README file.
         """
         output = str()
         DBM.i(f"Updating {name} chart...")
         if not EM.DEBUG_RUN:
-            DBM.i("\tAdding chart to repo...")
-            GitHubManager._copy_file_and_add_to_repo(path)
+            if updated or not isfile(join(GitHubManager.REPO.working_tree_dir, path)):
+                DBM.i("\tAdding chart to repo...")
+                GitHubManager._copy_file_and_add_to_repo(path)
+                if isfile(f"{path}.sha256"):
+                    GitHubManager._copy_file_and_add_to_repo(f"{path}.sha256")
+            else:
+                DBM.i("\tChart unchanged, skipping adding chart to repo...")
             chart_path = f"https://raw.githubusercontent.com/{GitHubManager._REMOTE_NAME}/{GitHubManager.branch(EM.PUSH_BRANCH_NAME)}/{path}"
             output += f"![{name} chart]({chart_path})\n\n"
 
         else:
             DBM.i("\tInlining chart...")
             hint = "You can use [this website](https://codebeautify.org/base64-to-image-converter) to view the generated base64 image."
+            mime = "image/svg+xml" if path.endswith(".svg") else "image/png"
             with open(path, "rb") as input_file:
-                output += f"{hint}\n```\ndata:image/png;base64,{b64encode(input_file.read()).decode('utf-8')}\n```\n\n"
+                output += f"{hint}\n```\ndata:{mime};base64,{b64encode(input_file.read()).decode('utf-8')}\n```\n\n"
         return output
 
     @staticmethod
@@ -161,8 +208,9 @@ class GitHubManager:
             DBM.i("Pushing files to repo...")
             headers = GitHubManager.REPO.remotes.origin.push()
 
-        if len(headers) == 0:
-            DBM.i(f"Repository push error: {headers}!")
+        failed = [info for info in headers if info.flags & (info.ERROR | info.REJECTED | info.REMOTE_REJECTED | info.REMOTE_FAILURE)]
+        if len(headers) == 0 or len(failed) > 0:
+            raise Exception(f"Repository push error: {', '.join(info.summary.strip() for info in failed) or 'nothing pushed'}!")
         else:
             DBM.i("Repository synchronized!")
 
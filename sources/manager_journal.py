@@ -0,0 +1,127 @@
+from json import dumps, loads
+from os import fsync, remove
+from os.path import isfile
+from typing import Dict, List, Optional, Tuple
+
+from manager_file import FileManager as FM
+from manager_debug import DebugManager as DBM
+
+
+def init_journal_manager(user: str):
+    """
+    Initialize journal manager:
+    - Restore progress of the previous interrupted commit crawl of the same user.
+    - Start recording progress of the current crawl.
+
+    :param user: GitHub user login, journal of other user is discarded.
+    """
+    JournalManager.load(user)
+
+
+class JournalManager:
+    """
+    Class for handling checkpoints of commit crawl.
+    Crawl is split into units (repository branches), progress of each unit is recorded page by page:
+    commits of the page, pagination cursor after the page and whether the unit is finished.
+    Each record is tagged with version of the unit (repository push date), so that the progress of repositories pushed since is discarded:
+    commits are crawled newest first, so the continued crawl would have missed the new commits.
+    Journal is stored as append-only JSON lines file in cache directory (see `FileManager.cache_path`), each line is flushed to disk upon recording.
+    If the crawl is interrupted, the next crawl restores recorded commits and continues each unit from its last cursor.
+    Nothing is recorded or restored until the manager is initialized.
+    """
+
+    JOURNAL_FILE = "commits_journal.jsonl"
+
+    _ENABLED = False
+    _UNITS: Dict[str, Dict] = dict()
+
+    @staticmethod
+    def _path() -> str:
+        """
+        Get journal file path.
+
+        :returns: Path of journal file in cache directory.
+        """
+        return FM.cache_path(JournalManager.JOURNAL_FILE)
+
+    @staticmethod
+    def _append(record: Dict):
+        """
+        Append record to journal file and flush it to disk.
+
+        :param record: Journal record dictionary.
+        """
+        with open(JournalManager._path(), "a", encoding="utf-8") as file:
+            file.write(f"{dumps(record)}\n")
+            file.flush()
+            fsync(file.fileno())
+
+    @staticmethod
+    def load(user: str):
+        """
+        Read journal of the previous crawl, if it was done for the same user.
+        Incomplete trailing record (written during interruption) is ignored.
+
+        :param user: GitHub user login.
+        """
+        JournalManager._UNITS = dict()
+        if isfile(JournalManager._path()):
+            with open(JournalManager._path(), encoding="utf-8") as file:
+                lines = file.read().splitlines()
+            try:
+                records = [loads(line) for line in lines]
+            except ValueError:
+                records = [loads(line) for line in lines[:-1]]
+            if len(records) > 0 and records[0].get("user") == user:
+                for record in records[1:]:
+                    unit = JournalManager._UNITS.get(record["unit"])
+                    if unit is None or unit["version"] != record.get("version"):
+                        unit = {"version": record.get("version"), "commits": list(), "cursor": None, "done": False}
+                        JournalManager._UNITS[record["unit"]] = unit
+                    unit["commits"] += record["commits"]
+                    unit["cursor"] = record["cursor"] or unit["cursor"]
+                    unit["done"] = record["done"]
+                DBM.g(f"\tCrawl journal restored, {sum(unit['done'] for unit in JournalManager._UNITS.values())} units finished previously!")
+            else:
+                remove(JournalManager._path())
+        if not isfile(JournalManager._path()):
+            JournalManager._append({"user": user})
+        JournalManager._ENABLED = True
+
+    @staticmethod
+    def restore(unit: str, version: Optional[str]) -> Tuple[List[Dict], Optional[str], bool]:
+        """
+        Get recorded progress of crawl unit, progress recorded for other unit version is discarded.
+
+        :param unit: Crawl unit identifier.
+        :param version: Current unit version (repository push date).
+        :returns: Tuple of recorded commits, cursor to continue pagination after and whether the unit is finished.
+        """
+        progress = JournalManager._UNITS.get(unit)
+        if progress is None or progress["version"] != version:
+            return list(), None, False
+        return progress["commits"], progress["cursor"], progress["done"]
+
+    @staticmethod
+    def record(unit: str, version: Optional[str], commits: List[Dict], cursor: Optional[str], done: bool):
+        """
+        Record progress of crawl unit.
+
+        :param unit: Crawl unit identifier.
+        :param version: Current unit version (repository push date).
+        :param commits: Commits crawled since the last record.
+        :param cursor: Cursor to continue pagination after.
+        :param done: True if the unit is finished, false otherwise.
+        """
+        if JournalManager._ENABLED:
+            JournalManager._append({"unit": unit, "version": version, "commits": commits, "cursor": cursor, "done": done})
+
+    @staticmethod
+    def clear():
+        """
+        Remove journal after crawl has finished successfully and stop recording.
+        """
+        if JournalManager._ENABLED and isfile(JournalManager._path()):
+            remove(JournalManager._path())
+        JournalManager._ENABLED = False
+        JournalManager._UNITS = dict()
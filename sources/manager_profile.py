@@ -0,0 +1,136 @@
+from cProfile import Profile
+from os.path import basename, join
+from sys import _current_frames
+from threading import Event, Thread, main_thread
+from time import perf_counter
+from tracemalloc import Snapshot, get_traced_memory, start as start_tracemalloc, stop as stop_tracemalloc, take_snapshot
+from types import FrameType
+from typing import Dict, Optional
+
+from manager_environment import EnvironmentManager as EM
+from manager_file import FileManager as FM
+from manager_debug import DebugManager as DBM
+
+
+SAMPLE_INTERVAL = 0.01  # Seconds between stack samples of main thread.
+TOP_ALLOCATORS = 15  # Number of source lines that allocated the most memory to report for each stage.
+TRACEMALLOC_FRAMES = 8  # Number of frames stored for each memory allocation.
+
+
+def init_profile_manager():
+    """
+    Initialize profile manager:
+    - Start deterministic CPU profiler, stack sampler and memory allocations tracing, if profiling is enabled.
+    """
+    if EM.PROFILING:
+        ProfileManager.start()
+
+
+class ProfileManager:
+    """
+    Class for handling opt-in profiling of the action run (`PROFILING` variable).
+    CPU time is recorded by both deterministic profiler (saved as pstats file) and main thread stack sampler (saved as collapsed stacks, for flame graphs).
+    Memory allocations are traced and compared at stage boundaries, top allocators of each stage are saved as text report.
+    All the artifacts are saved to 'assets' directory upon `finish` call.
+    """
+
+    PSTATS_FILE = "profile.pstats"
+    STACKS_FILE = "profile_stacks.collapsed"
+    MEMORY_FILE = "profile_memory.txt"
+
+    _PROFILE: Optional[Profile] = None
+    _SAMPLER: Optional[Thread] = None
+    _STOP = Event()
+    _STACKS: Dict[str, int] = dict()
+    _SNAPSHOT: Optional[Snapshot] = None
+    _STAGE_START = 0.0
+
+    @staticmethod
+    def _frame_name(frame: FrameType) -> str:
+        """
+        Get human-readable frame identifier.
+
+        :param frame: Stack frame.
+        :returns: Function name, file name and function first line number.
+        """
+        return f"{frame.f_code.co_name} ({basename(frame.f_code.co_filename)}:{frame.f_code.co_firstlineno})"
+
+    @staticmethod
+    def _sample():
+        """
+        Sample main thread stack every `SAMPLE_INTERVAL` seconds until stopped, count samples of each stack.
+        """
+        thread_id = main_thread().ident
+        while not ProfileManager._STOP.wait(SAMPLE_INTERVAL):
+            frame = _current_frames().get(thread_id)
+            stack = list()
+            while frame is not None:
+                stack += [ProfileManager._frame_name(frame)]
+                frame = frame.f_back
+            stack = ";".join(reversed(stack))
+            ProfileManager._STACKS[stack] = ProfileManager._STACKS.get(stack, 0) + 1
+
+    @staticmethod
+    def start():
+        """
+        Start profiling: CPU profiler, stack sampler thread and memory tracing.
+        """
+        DBM.i("Profiling enabled, profile will be saved to assets...")
+        start_tracemalloc(TRACEMALLOC_FRAMES)
+        ProfileManager._SNAPSHOT = take_snapshot()
+        ProfileManager._STAGE_START = perf_counter()
+        FM.write_file(ProfileManager.MEMORY_FILE, "", assets=True)
+
+        ProfileManager._STOP.clear()
+        ProfileManager._STACKS = dict()
+        ProfileManager._SAMPLER = Thread(target=ProfileManager._sample, daemon=True)
+        ProfileManager._SAMPLER.start()
+        ProfileManager._PROFILE = Profile()
+        ProfileManager._PROFILE.enable()
+
+    @staticmethod
+    def checkpoint(stage: str):
+        """
+        Mark the end of run stage: report stage duration, traced memory and top allocators since the previous checkpoint.
+        CPU profiler is paused while the checkpoint is taken.
+        Does nothing if profiling is disabled.
+
+        :param stage: Name of the stage that has just finished.
+        """
+        if ProfileManager._SNAPSHOT is None:
+            return
+        ProfileManager._PROFILE.disable()
+        snapshot = take_snapshot()
+        current, peak = get_traced_memory()
+        duration = perf_counter() - ProfileManager._STAGE_START
+        statistics = snapshot.compare_to(ProfileManager._SNAPSHOT, "lineno")[:TOP_ALLOCATORS]
+
+        report = f"Stage '{stage}': {duration:.3f} s, traced memory {current / 2**20:.1f} MiB (peak {peak / 2**20:.1f} MiB)\n"
+        report += "".join(f"\t{statistic}\n" for statistic in statistics)
+        FM.write_file(ProfileManager.MEMORY_FILE, f"{report}\n", append=True, assets=True)
+        DBM.i(f"\tProfiling stage '{stage}' finished in {duration:.3f} s, traced memory {current / 2**20:.1f} MiB.")
+
+        ProfileManager._SNAPSHOT = take_snapshot()
+        ProfileManager._STAGE_START = perf_counter()
+        ProfileManager._PROFILE.enable()
+
+    @staticmethod
+    def finish():
+        """
+        Stop profiling and save profile artifacts to 'assets' directory.
+        Does nothing if profiling is disabled.
+        """
+        if ProfileManager._PROFILE is None:
+            return
+        ProfileManager._STOP.set()
+        ProfileManager._SAMPLER.join()
+        ProfileManager.checkpoint("Finish")
+        ProfileManager._PROFILE.disable()
+        stop_tracemalloc()
+
+        ProfileManager._PROFILE.dump_stats(join(FM.ASSETS_DIR, ProfileManager.PSTATS_FILE))
+        stacks = "".join(f"{stack} {count}\n" for stack, count in sorted(ProfileManager._STACKS.items()))
+        FM.write_file(ProfileManager.STACKS_FILE, stacks, assets=True)
+        ProfileManager._PROFILE = None
+        ProfileManager._SNAPSHOT = None
+        DBM.g("Profile saved to assets!")
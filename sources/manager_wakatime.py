@@ -0,0 +1,314 @@
+from asyncio import Task, create_task, get_running_loop, sleep
+from datetime import date, timedelta
+from hashlib import sha256
+from json import dumps, load as load_json
+from os.path import isfile
+from typing import Dict, Optional
+
+from manager_download import DownloadManager as DM
+from manager_environment import EnvironmentManager as EM
+from manager_file import FileManager as FM
+from manager_debug import DebugManager as DBM
+
+
+WAKATIME_USER_URL = "https://wakatime.com/api/v1/users/current"  # WakaTime API endpoint of current user info.
+WAKATIME_SUMMARIES_URL = "https://wakatime.com/api/v1/users/current/summaries"  # WakaTime API endpoint of daily summaries.
+SUMMARIES_CATEGORIES = ["languages", "editors", "operating_systems"]  # Daily summaries categories kept in local store.
+SUMMARIES_CHUNK_DAYS = 90  # Maximum number of days requested from daily summaries endpoint at once.
+POLL_INITIAL_DELAY = 2.0  # Seconds to wait before polling resource that is still being computed for the first time.
+POLL_MAX_DELAY = 30.0  # Maximum seconds to wait between polls of resource that is still being computed.
+POLL_BACKOFF = 2  # Multiplier of delay between consecutive polls.
+PLAN_LIMIT_CODES = (402,)  # WakaTime API status codes of requests for history beyond account plan limits.
+
+
+async def init_wakatime_manager():
+    """
+    Initialize WakaTime manager:
+    - Restore stored WakaTime daily summaries.
+    - Launch ingestion of new daily summaries in background.
+    """
+    await WakaTimeManager.refresh()
+
+
+class WakaTimeManager:
+    """
+    Class for handling WakaTime stats, aggregated locally from daily summaries.
+    Daily summaries are stored as JSON file in cache directory (see `FileManager.cache_path`): time spent in total and per language, editor and OS for each day.
+    Upon ingestion, only days since the last stored day are requested, then older days are backfilled (newest first) until user registration date.
+    Ingestion runs in background, WakaTime responding with 202 status code (while it computes summaries) is polled with backoff until `WAKATIME_DEADLINE`.
+    Upon request, stats are aggregated from stored days: if ingestion hasn't finished yet, the previously stored days are used right away.
+    Ingestion is awaited (until the deadline) only if the stored days don't cover the requested range yet.
+    Stats are unavailable until the range is backfilled completely, so that partial history is never shown as complete.
+    If WakaTime plan limits the history, the oldest available date is found and stored, stats are then limited to the history since that date.
+    """
+
+    SUMMARIES_STORE = "wakatime_summaries.json"
+    STORE_VERSION = 3
+
+    _INGESTION: Optional[Task] = None
+    _STORE: Optional[Dict] = None
+
+    @staticmethod
+    def _owner() -> str:
+        """
+        Get identifier of WakaTime account the summaries belong to, without revealing API key.
+
+        :returns: API key hash.
+        """
+        return sha256(EM.WAKATIME_API_KEY.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _load_store():
+        """
+        Read daily summaries store, if it belongs to the current WakaTime account and was saved by the same store version.
+        Store contains user registration date ("registered"), the oldest date available with WakaTime plan ("available", None if history isn't limited),
+        the oldest backfilled date ("backfilled") and summaries of each day ("days").
+        """
+        WakaTimeManager._STORE = {"version": WakaTimeManager.STORE_VERSION, "owner": WakaTimeManager._owner(), "timezone": "UTC"}
+        WakaTimeManager._STORE.update({"registered": None, "available": None, "backfilled": None, "days": dict()})
+        path = FM.cache_path(WakaTimeManager.SUMMARIES_STORE)
+        if isfile(path):
+            try:
+                with open(path, encoding="utf-8") as file:
+                    store = load_json(file)
+            except ValueError:
+                DBM.w("\tWakaTime summaries store is corrupted, ignoring.")
+                return
+            if store.get("owner") == WakaTimeManager._owner() and store.get("version") == WakaTimeManager.STORE_VERSION:
+                WakaTimeManager._STORE = store
+
+    @staticmethod
+    def _save_store():
+        """
+        Write daily summaries store to cache directory.
+        """
+        FM.write_file(FM.cache_path(WakaTimeManager.SUMMARIES_STORE), dumps(WakaTimeManager._STORE))
+
+    @staticmethod
+    async def _poll(url: str, deadline: float) -> Optional[Dict]:
+        """
+        Request resource until it is computed or the deadline is reached, with exponential backoff between requests.
+
+        :param url: WakaTime resource URL, without API key.
+        :param deadline: Event loop time to stop polling at.
+        :returns: Resource response JSON dictionary, empty dictionary if it's beyond account plan limits or None if it wasn't computed in time.
+        """
+        delay = POLL_INITIAL_DELAY
+        while True:
+            data = await DM.get_remote_json_once(f"{url}{'&' if '?' in url else '?'}api_key={EM.WAKATIME_API_KEY}", PLAN_LIMIT_CODES)
+            if data is not None:
+                return data
+            elif get_running_loop().time() + delay > deadline:
+                DBM.w("\tWakaTime resource wasn't computed in time!")
+                return None
+            DBM.i(f"\tWakaTime resource is still being computed, retrying in {delay} seconds...")
+            await sleep(delay)
+            delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+
+    @staticmethod
+    async def _ingest_range(start: date, end: date, deadline: float) -> Optional[bool]:
+        """
+        Request daily summaries of the given dates range and add them to the store.
+
+        :param start: First date of the range.
+        :param end: Last date of the range (inclusive), no more than `SUMMARIES_CHUNK_DAYS` days after the first one.
+        :param deadline: Event loop time to stop polling at.
+        :returns: True if the summaries were stored, false if the range is beyond account plan limits, None if they weren't computed in time.
+        """
+        summaries = await WakaTimeManager._poll(f"{WAKATIME_SUMMARIES_URL}?start={start}&end={end}", deadline)
+        if summaries is None:
+            return None
+        elif len(summaries) == 0:
+            return False
+        for summary in summaries["data"]:
+            categories = {category: {item["name"]: item["total_seconds"] for item in summary[category]} for category in SUMMARIES_CATEGORIES}
+            WakaTimeManager._STORE["days"][summary["range"]["date"]] = {"total": summary["grand_total"]["total_seconds"], **categories}
+            WakaTimeManager._STORE["timezone"] = summary["range"].get("timezone") or WakaTimeManager._STORE["timezone"]
+        return True
+
+    @staticmethod
+    async def _ingest_available(start: date, end: date, deadline: float) -> Optional[date]:
+        """
+        Request daily summaries of the given dates range and add them to the store.
+        If the range is beyond account plan limits, the oldest available date of the range is searched for by bisection,
+        summaries of each accepted narrower range are stored, so that only the days older than it are requested next.
+
+        :param start: First date of the range.
+        :param end: Last date of the range (inclusive), no more than `SUMMARIES_CHUNK_DAYS` days after the first one.
+        :param deadline: Event loop time to stop polling at.
+        :returns: The oldest stored date of the range (the day after the range if none is available) or None if summaries weren't computed in time.
+        """
+        stored, rejected, probe = end + timedelta(days=1), None, start
+        while probe < stored:
+            result = await WakaTimeManager._ingest_range(probe, stored - timedelta(days=1), deadline)
+            if result is None:
+                return None
+            elif result:
+                stored = probe
+            else:
+                rejected = probe
+            if rejected is None:
+                break
+            probe = rejected + timedelta(days=((stored - rejected).days + 1) // 2)
+        return stored
+
+    @staticmethod
+    async def _ingest(deadline: float):
+        """
+        Request daily summaries since the last stored day (which may have been incomplete) till today and store them.
+        Then backfill older summaries till user registration date, newest first, in chunks of `SUMMARIES_CHUNK_DAYS` days.
+        The store is saved after each chunk, so that interrupted backfill is continued next time.
+        If WakaTime plan limits the history, backfill stops at the oldest available date.
+        If the days since the last stored day are not available anymore, the older stored days are dropped, as they can't be continued.
+
+        :param deadline: Event loop time to stop polling at.
+        """
+        store = WakaTimeManager._STORE
+        if store["registered"] is None:
+            user = await WakaTimeManager._poll(WAKATIME_USER_URL, deadline)
+            if user is None:
+                return
+            store["registered"] = user["data"]["created_at"][:10]
+        registered = date.fromisoformat(store["registered"])
+
+        today = date.today()
+        if len(store["days"]) > 0:
+            start = date.fromisoformat(max(store["days"].keys()))
+        else:
+            start = max(today - timedelta(days=SUMMARIES_CHUNK_DAYS - 1), registered)
+        while start <= today:
+            end = min(start + timedelta(days=SUMMARIES_CHUNK_DAYS - 1), today)
+            available = await WakaTimeManager._ingest_available(start, end, deadline)
+            if available is None:
+                return
+            elif available > start:
+                DBM.w(f"\tWakaTime history before {available} is beyond account plan limits, dropping the older stored summaries.")
+                store["days"] = {day: summary for day, summary in store["days"].items() if day >= available.isoformat()}
+                store["available"], store["backfilled"] = available.isoformat(), None
+            store["backfilled"] = store["backfilled"] or available.isoformat()
+            WakaTimeManager._save_store()
+            start = end + timedelta(days=1)
+
+        oldest = max(registered, date.fromisoformat(store["available"] or store["registered"]))
+        while date.fromisoformat(store["backfilled"]) > oldest:
+            end = date.fromisoformat(store["backfilled"]) - timedelta(days=1)
+            start = max(end - timedelta(days=SUMMARIES_CHUNK_DAYS - 1), oldest)
+            DBM.i(f"\tBackfilling WakaTime summaries since {start}...")
+            available = await WakaTimeManager._ingest_available(start, end, deadline)
+            if available is None:
+                return
+            elif available > start:
+                DBM.w(f"\tWakaTime history before {available} is beyond account plan limits, stats are limited to the history since then.")
+                store["available"], oldest = available.isoformat(), available
+            store["backfilled"] = available.isoformat()
+            WakaTimeManager._save_store()
+        DBM.g("\tWakaTime summaries ingested!")
+
+    @staticmethod
+    async def refresh():
+        """
+        Launch (or relaunch) ingestion of new daily summaries in background.
+        Restores stored daily summaries if they weren't restored before.
+        """
+        if WakaTimeManager._STORE is None:
+            WakaTimeManager._load_store()
+        WakaTimeManager.close()
+        deadline = get_running_loop().time() + EM.WAKATIME_DEADLINE
+        WakaTimeManager._INGESTION = create_task(WakaTimeManager._ingest(deadline))
+
+    @staticmethod
+    def _duration_text(seconds: float) -> str:
+        """
+        Format time duration the way WakaTime does.
+
+        :param seconds: Duration in seconds.
+        :returns: Duration string, e.g. "3 hrs 12 mins".
+        """
+        hours, minutes = int(seconds // 3600), int(seconds % 3600 // 60)
+        text = f"{minutes} min{'' if minutes == 1 else 's'}"
+        return text if hours == 0 else f"{hours} hr{'' if hours == 1 else 's'} {text}"
+
+    @staticmethod
+    def _aggregate(start: Optional[date], end: Optional[date]) -> Optional[Dict]:
+        """
+        Aggregate stored daily summaries of the given dates range.
+
+        :param start: First date of the range, range is unbounded if None.
+        :param end: Last date of the range (inclusive), range is unbounded if None.
+        :returns: Stats dictionary or None if there are no stored days.
+            Stats of range starting before the oldest date available with WakaTime plan are marked with that date ("since").
+        """
+        days = WakaTimeManager._STORE["days"]
+        if len(days) == 0:
+            return None
+        start = "" if start is None else start.isoformat()
+        end = "9999-12-31" if end is None else end.isoformat()
+
+        total = 0.0
+        totals = {category: dict() for category in SUMMARIES_CATEGORIES}
+        for day, summary in days.items():
+            if start <= day <= end:
+                total += summary["total"]
+                for category in SUMMARIES_CATEGORIES:
+                    for name, seconds in summary[category].items():
+                        totals[category][name] = totals[category].get(name, 0.0) + seconds
+
+        available = WakaTimeManager._STORE["available"]
+        since = available if available is not None and start < available else None
+        stats = {"timezone": WakaTimeManager._STORE["timezone"], "total_seconds": total, "since": since}
+        for category, items in totals.items():
+            names = sorted(items.keys(), key=lambda name: items[name], reverse=True)
+            stats[category] = [
+                {"name": name, "text": WakaTimeManager._duration_text(items[name]), "percent": 0 if total == 0 else round(items[name] / total * 100, 2)}
+                for name in names
+            ]
+        return stats
+
+    @staticmethod
+    def _covers(start: Optional[date]) -> bool:
+        """
+        Check if stored daily summaries were backfilled since the given date (or user registration date or the oldest date available with WakaTime plan,
+        whatever is later).
+
+        :param start: First date of the range, user registration date is used if None.
+        :returns: True if all the days of the range were requested, false otherwise.
+        """
+        store = WakaTimeManager._STORE
+        if store["backfilled"] is None:
+            return False
+        return store["backfilled"] <= max("" if start is None else start.isoformat(), store["registered"], store["available"] or "")
+
+    @staticmethod
+    async def get_stats(start: Optional[date] = None, end: Optional[date] = None) -> Optional[Dict]:
+        """
+        Get WakaTime stats of the given dates range, aggregated from stored daily summaries.
+        If ingestion hasn't finished yet, the previously stored days are used right away, unless they don't cover the range.
+        Stats are unavailable if the range isn't backfilled completely, even after ingestion (that failed or wasn't finished in time).
+
+        :param start: First date of the range, all stored days are used if None.
+        :param end: Last date of the range (inclusive), all stored days are used if None.
+        :returns: Stats dictionary: "timezone", "total_seconds", "since" (the oldest date the stats include if WakaTime plan limits the range, None otherwise)
+            and "languages", "editors", "operating_systems" lists (of dictionaries with "name", "text" and "percent", sorted by time spent)
+            or None if stats are unavailable.
+        """
+        ingestion = WakaTimeManager._INGESTION
+        if not ingestion.done() and WakaTimeManager._covers(start):
+            DBM.i("\tWakaTime summaries are not ingested yet, using the stored ones...")
+            return WakaTimeManager._aggregate(start, end)
+
+        try:
+            await ingestion
+        except Exception as e:
+            DBM.w(f"\tWakaTime summaries ingestion failed: {e}")
+        if not WakaTimeManager._covers(start):
+            DBM.w("\tWakaTime summaries are not backfilled yet, stats are unavailable.")
+            return None
+        return WakaTimeManager._aggregate(start, end)
+
+    @staticmethod
+    def close():
+        """
+        Cancel unfinished ingestion of WakaTime summaries.
+        """
+        if WakaTimeManager._INGESTION is not None and not WakaTimeManager._INGESTION.done():
+            WakaTimeManager._INGESTION.cancel()
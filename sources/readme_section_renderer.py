@@ -0,0 +1,122 @@
+from asyncio import Task, create_task, gather
+from hashlib import sha256
+from json import dumps, load as load_json
+from os.path import isfile
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from manager_environment import EnvironmentManager as EM
+from manager_file import FileManager as FM
+from manager_debug import DebugManager as DBM
+
+
+SECTIONS_CACHE = "readme_sections.json"  # Name of cache file for rendered README sections, saved in cache directory.
+SECTIONS_VERSION = 2  # Version of sections rendering, should be increased on every change of section output format.
+_SECRET_VARIABLES = ["GH_TOKEN", "WAKATIME_API_KEY", "DAEMON_WEBHOOK_SECRET"]  # Environmental variables excluded from section input hashes.
+
+
+class Section:
+    """
+    Class describing README section: identifier, condition, data dependencies and rendering function.
+    """
+
+    def __init__(self, name: str, enabled: Callable[[], bool], dependencies: List[str], render: Callable[..., Awaitable[str]], cached: bool = True):
+        """
+        :param name: Section identifier, should be unique.
+        :param enabled: Function returning true if the section should be rendered (usually checks `SHOW_*` variables).
+        :param dependencies: Names of inputs the section is rendered from, passed to rendering function as keyword arguments.
+        :param render: Async function rendering section string from its dependencies.
+        :param cached: True if section output can be reused while its inputs don't change, false if rendering has side effects.
+        """
+        self.name = name
+        self.enabled = enabled
+        self.dependencies = dependencies
+        self.render = render
+        self.cached = cached
+
+
+class SectionRenderer:
+    """
+    Class for handling README sections rendering.
+    Only enabled sections are rendered, concurrently, then joined in the order they are given in.
+    Inputs are resolved only if an enabled section depends on them.
+    Output of each section is cached by hash of its inputs and action settings, cache is saved as JSON file in cache directory (see `FileManager.cache_path`).
+    Sections whose inputs haven't changed since the previous run are reused from cache instead of being rendered.
+    """
+
+    _CACHE: Optional[Dict[str, Dict[str, str]]] = None
+
+    @staticmethod
+    def _load_cache():
+        """
+        Read cached sections, if they were rendered by the same sections version.
+        """
+        SectionRenderer._CACHE = dict()
+        path = FM.cache_path(SECTIONS_CACHE)
+        if isfile(path):
+            try:
+                with open(path, encoding="utf-8") as file:
+                    cache = load_json(file)
+            except ValueError:
+                DBM.w("\tSections cache is corrupted, ignoring.")
+                return
+            if cache.get("version") == SECTIONS_VERSION:
+                SectionRenderer._CACHE = cache["sections"]
+
+    @staticmethod
+    def _hash_inputs(section: Section, values: Dict[str, Any]) -> str:
+        """
+        Hash section inputs and all the action settings (except for secrets).
+
+        :param section: Section to hash inputs of.
+        :param values: Dictionary of section dependencies names and values.
+        :returns: Hex digest of inputs hash.
+        """
+        settings = {name: value for name, value in vars(EM).items() if name.isupper() and not name.startswith("_") and name not in _SECRET_VARIABLES}
+        return sha256(dumps([section.name, settings, values], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    async def _render_section(section: Section, inputs: Dict[str, Any], providers: Dict[str, Task]) -> str:
+        """
+        Render single section or reuse its cached output if its inputs haven't changed.
+
+        :param section: Section to render.
+        :param inputs: Dictionary of input names and values.
+        :param providers: Dictionary of input names and tasks resolving them, for inputs given as async functions.
+        :returns: Section string.
+        """
+        values = {name: await providers[name] if name in providers else inputs[name] for name in section.dependencies}
+        if not section.cached:
+            return await section.render(**values)
+
+        inputs_hash = SectionRenderer._hash_inputs(section, values)
+        cached = SectionRenderer._CACHE.get(section.name)
+        if cached is not None and cached["hash"] == inputs_hash:
+            DBM.i(f"\tSection '{section.name}' unchanged, reusing cached output...")
+            return cached["output"]
+        output = await section.render(**values)
+        SectionRenderer._CACHE[section.name] = {"hash": inputs_hash, "output": output}
+        DBM.i(f"\tSection '{section.name}' rendered!")
+        return output
+
+    @staticmethod
+    async def render(sections: List[Section], inputs: Dict[str, Any]) -> str:
+        """
+        Render enabled sections and join them into README stats string.
+
+        :param sections: List of sections, in the order they should appear in.
+        :param inputs: Dictionary of input names and values, values given as async functions are awaited (once) only if an enabled section depends on them.
+        :returns: String representation of README stats.
+        """
+        if SectionRenderer._CACHE is None:
+            SectionRenderer._load_cache()
+        enabled = [section for section in sections if section.enabled()]
+        dependencies = {name for section in enabled for name in section.dependencies}
+        providers = {name: create_task(inputs[name]()) for name in dependencies if callable(inputs[name])}
+
+        try:
+            outputs = await gather(*[SectionRenderer._render_section(section, inputs, providers) for section in enabled])
+        finally:
+            for provider in providers.values():
+                provider.cancel()
+        FM.write_file(FM.cache_path(SECTIONS_CACHE), dumps({"version": SECTIONS_VERSION, "sections": SectionRenderer._CACHE}))
+        return "".join(outputs)
@@ -1,50 +1,360 @@
-from asyncio import sleep
-from json import dumps
+from array import array
+from asyncio import FIRST_COMPLETED, PriorityQueue, create_subprocess_exec, create_task, gather, sleep, wait
+from asyncio.subprocess import DEVNULL, PIPE
+from itertools import count
+from os.path import join
+from json import dumps, loads
 from re import search
-from datetime import datetime
-from typing import Dict, Tuple
+from datetime import datetime, timezone
+from tempfile import TemporaryDirectory
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
 
+from commit_rollup import merge_rollup_data, update_rollup_data
 from manager_download import DownloadManager as DM
 from manager_environment import EnvironmentManager as EM
 from manager_github import GitHubManager as GHM
 from manager_file import FileManager as FM
 from manager_debug import DebugManager as DBM
+from manager_journal import init_journal_manager, JournalManager as JM
 
 
-async def calculate_commit_data(repositories: Dict) -> Tuple[Dict, Dict]:
+MAX_CONTRIBUTION_REPOSITORIES = 100  # Maximum number of repositories returned by contributions query, results are incomplete if reached.
+COMMIT_DATA_CACHE = "commits_data.bin"  # Name of cache file for commit data of debug runs, saved in assets.
+REPOSITORIES_SYNC_CACHE = "repositories_sync.bin"  # Name of cache file for commit data of each repository, saved in cache directory.
+_COMMIT_DATA_VERSION = 2  # Version of commit data encoding, cached commit data of other versions is discarded.
+_COMMIT_DATA_SECTIONS = {  # Binary cache sections of commit data and their array typecodes, see `encode_commit_data`.
+    "repo_key": "i",
+    "repo_pushed": "i",
+    "yearly_repo": "i",
+    "yearly_year": "h",
+    "yearly_quarter": "b",
+    "yearly_language": "i",
+    "yearly_add": "q",
+    "yearly_del": "q",
+    "dates_repo": "i",
+    "dates_name": "i",
+    "dates_branch": "i",
+    "dates_oid": "B",
+    "dates_time": "q",
+    "rollup_repo": "i",
+    "rollup_name": "i",
+    "rollup_language": "i",
+    "rollup_day": "i",
+    "rollup_hour": "b",
+    "rollup_commits": "i",
+    "rollup_add": "q",
+    "rollup_del": "q",
+}
+CRAWL_WORKERS = 4  # Number of repository branches crawled concurrently.
+LOCAL_MINING_MIN_COMMITS = 5000  # Minimal default branch commit count of repository to be mined from local clone instead of GitHub API.
+
+
+async def collect_contributed_repositories() -> Optional[Set[Tuple[str, str]]]:
+    """
+    Collect repositories user has committed to, for each year user has contributed in.
+    NB! Only commits to default branches are counted, so repositories missing from the set may still have user commits in other branches.
+    If any year has too many contributed repositories to be listed, contributed repositories can't be determined.
+
+    :returns: Set of owner login and repository name tuples or None if it can't be determined.
+    """
+    response = await DM.get_remote_graphql("user_contribution_years", username=GHM.USER.login)
+    years = response["data"]["user"]["contributionsCollection"]["contributionYears"]
+    queries = [
+        DM.get_remote_graphql("user_repository_contributions", username=GHM.USER.login, start=f"{y}-01-01T00:00:00Z", end=f"{y}-12-31T23:59:59Z") for y in years
+    ]
+
+    contributed = set()
+    for response in await gather(*queries):
+        nodes = response["data"]["user"]["contributionsCollection"]["commitContributionsByRepository"]
+        if len(nodes) >= MAX_CONTRIBUTION_REPOSITORIES:
+            DBM.w("\tToo many contributed repositories, repository pruning disabled.")
+            return None
+        contributed |= {(node["repository"]["owner"]["login"], node["repository"]["name"]) for node in nodes if node["contributions"]["totalCount"] > 0}
+    return contributed
+
+
+async def calculate_commit_data(repositories: AsyncIterable[Dict]) -> Tuple[Dict, Dict, Dict]:
     """
     Calculate commit data by years.
     Commit data includes contribution additions and deletions in each quarter of each recorded year.
+    Single branch repositories user hasn't committed to are skipped, repositories not pushed since last sync are restored from cache.
+    Repositories with several branches are never skipped: contributions are counted for default branches only, see `collect_contributed_repositories`.
+    Repositories are crawled as soon as they are discovered.
 
-    :param repositories: user repositories info dictionary.
-    :returns: Commit quarter yearly data dictionary.
+    :param repositories: Iterator of user repositories info dictionaries, it is consumed completely.
+    :returns: Commit quarter yearly data dictionary, commit date dictionary and rollup data dictionary.
     """
     DBM.i("Calculating commit data...")
     if EM.DEBUG_RUN:
-        content = FM.cache_binary("commits_data.pick", assets=True)
-        if content is not None:
+        user, content = restore_commit_data(join(FM.ASSETS_DIR, COMMIT_DATA_CACHE))
+        if user is not None:
+            async for _ in repositories:
+                pass
             DBM.g("Commit data restored from cache!")
-            return tuple(content)
+            return content[""]["data"]
         else:
             DBM.w("No cached commit data found, recalculating...")
 
-    yearly_data = dict()
-    date_data = dict()
-    for ind, repo in enumerate(repositories):
-        if repo["name"] not in EM.IGNORED_REPOS:
-            repo_name = "[private]" if repo["isPrivate"] else f"{repo['owner']['login']}/{repo['name']}"
-            DBM.i(f"\t{ind + 1}/{len(repositories)} Retrieving repo: {repo_name}")
-            await update_data_with_commit_stats(repo, yearly_data, date_data)
+    init_journal_manager(GHM.USER.login)
+    user, synced = restore_commit_data(FM.cache_path(REPOSITORIES_SYNC_CACHE))
+    synced = synced if user == GHM.USER.login else dict()
+    contributions = create_task(collect_contributed_repositories())
+
+    repository_data = dict()
+    crawled_data = dict()
+
+    async def schedule() -> AsyncIterator[Dict]:
+        ind = 0
+        async for repo in repositories:
+            ind += 1
+            if repo["name"] in EM.IGNORED_REPOS:
+                continue
+            contributed = await contributions
+            repo_key = f"{repo['owner']['login']}/{repo['name']}"
+            repo_name = "[private]" if repo["isPrivate"] else repo_key
+            if contributed is not None and _branch_count(repo) == 1 and (repo["owner"]["login"], repo["name"]) not in contributed:
+                DBM.i(f"\t{ind} Skipping repo without contributions: {repo_name}")
+            elif repo_key in synced and repo["pushedAt"] is not None and synced[repo_key]["pushedAt"] == repo["pushedAt"]:
+                DBM.i(f"\t{ind} Repo not pushed since last sync: {repo_name}")
+                repository_data[repo_key] = synced[repo_key]
+            else:
+                DBM.i(f"\t{ind} Scheduling repo: {repo_name}")
+                repository_data[repo_key] = {"pushedAt": repo["pushedAt"], "data": (dict(), dict(), dict())}
+                crawled_data[repo_key] = repository_data[repo_key]["data"]
+                yield repo
+
+    try:
+        await crawl_repositories(schedule(), crawled_data)
+    finally:
+        contributions.cancel()
+    yearly_data, date_data, rollup_data = merge_commit_data([repo["data"] for repo in repository_data.values()])
+    FM.cache_binary(FM.cache_path(REPOSITORIES_SYNC_CACHE), encode_commit_data(GHM.USER.login, repository_data))
+    JM.clear()
     DBM.g("Commit data calculated!")
 
     if EM.DEBUG_RUN:
-        FM.cache_binary("commits_data.pick", [yearly_data, date_data], assets=True)
-        FM.write_file("commits_data.json", dumps([yearly_data, date_data]), assets=True)
+        debug_data = {"": {"pushedAt": None, "data": (yearly_data, date_data, rollup_data)}}
+        FM.cache_binary(COMMIT_DATA_CACHE, encode_commit_data(GHM.USER.login, debug_data), assets=True)
         DBM.g("Commit data saved to cache!")
-    return yearly_data, date_data
+    return yearly_data, date_data, rollup_data
+
 
+def restore_commit_data(path: str) -> Tuple[Optional[str], Dict[str, Dict]]:
+    """
+    Read commit data of repositories from binary cache file.
+    Cache encoded with different commit data version is treated as missing.
+
+    :param path: Cache file path.
+    :returns: GitHub user login and dictionary of repository keys and dictionaries with "pushedAt" and "data", None and empty dictionary if cache is missing.
+    """
+    content = FM.cache_binary(path)
+    if content is None:
+        return None, dict()
+    elif loads(content["meta"].tobytes()).get("version") != _COMMIT_DATA_VERSION:
+        DBM.w(f"Cache '{path}' was saved by different version, ignoring.")
+        return None, dict()
+    return decode_commit_data(content)
+
+
+def encode_commit_data(user: str, repository_data: Dict[str, Dict]) -> Dict[str, array]:
+    """
+    Encode commit data of repositories into columnar sections for binary cache.
+    All strings are stored once in "meta" JSON section and referenced by index, commit dates are stored as UNIX timestamps.
+
+    :param user: GitHub user login.
+    :param repository_data: Dictionary of repository keys and dictionaries with "pushedAt" and "data" (yearly data, commit date and rollup data dictionaries).
+    :returns: Dictionary of section names and arrays.
+    """
+    strings = dict()
+    sections = {name: array(typecode) for name, typecode in _COMMIT_DATA_SECTIONS.items()}
+    for repo_index, (repo_key, repo) in enumerate(repository_data.items()):
+        sections["repo_key"].append(strings.setdefault(repo_key, len(strings)))
+        sections["repo_pushed"].append(-1 if repo["pushedAt"] is None else strings.setdefault(repo["pushedAt"], len(strings)))
+        yearly_data, date_data, rollup_data = repo["data"]
+        for year, quarters in yearly_data.items():
+            for quarter, languages in quarters.items():
+                for language, stats in languages.items():
+                    sections["yearly_repo"].append(repo_index)
+                    sections["yearly_year"].append(year)
+                    sections["yearly_quarter"].append(quarter)
+                    sections["yearly_language"].append(strings.setdefault(language, len(strings)))
+                    sections["yearly_add"].append(stats["add"])
+                    sections["yearly_del"].append(stats["del"])
+        for repo_name, branches in date_data.items():
+            for branch, commits in branches.items():
+                for oid, date in commits.items():
+                    sections["dates_repo"].append(repo_index)
+                    sections["dates_name"].append(strings.setdefault(repo_name, len(strings)))
+                    sections["dates_branch"].append(strings.setdefault(branch, len(strings)))
+                    sections["dates_oid"].frombytes(bytes.fromhex(oid))
+                    sections["dates_time"].append(int(datetime.strptime(date, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).timestamp()))
+        for repo_name, languages in rollup_data.items():
+            for language, days in languages.items():
+                for day, hours in days.items():
+                    for hour, (commits, additions, deletions) in hours.items():
+                        sections["rollup_repo"].append(repo_index)
+                        sections["rollup_name"].append(strings.setdefault(repo_name, len(strings)))
+                        sections["rollup_language"].append(strings.setdefault(language, len(strings)))
+                        sections["rollup_day"].append(day)
+                        sections["rollup_hour"].append(hour)
+                        sections["rollup_commits"].append(commits)
+                        sections["rollup_add"].append(additions)
+                        sections["rollup_del"].append(deletions)
+    sections["meta"] = array("B", dumps({"user": user, "version": _COMMIT_DATA_VERSION, "strings": list(strings.keys())}).encode("utf-8"))
+    return sections
+
+
+def decode_commit_data(sections: Dict[str, memoryview]) -> Tuple[str, Dict[str, Dict]]:
+    """
+    Decode commit data of repositories from binary cache sections, see `encode_commit_data`.
 
-async def update_data_with_commit_stats(repo_details: Dict, yearly_data: Dict, date_data: Dict):
+    :param sections: Dictionary of section names and typed memoryviews.
+    :returns: GitHub user login and dictionary of repository keys and dictionaries with "pushedAt" and "data".
+    """
+    meta = loads(sections["meta"].tobytes())
+    strings = meta["strings"]
+    repositories = [
+        (strings[key], None if pushed == -1 else strings[pushed], dict(), dict(), dict())
+        for key, pushed in zip(sections["repo_key"].tolist(), sections["repo_pushed"].tolist())
+    ]
+
+    yearly = zip(*[sections[f"yearly_{column}"].tolist() for column in ("repo", "year", "quarter", "language", "add", "del")])
+    for repo_index, year, quarter, language, additions, deletions in yearly:
+        loc = repositories[repo_index][2].setdefault(year, dict()).setdefault(quarter, dict()).setdefault(strings[language], {"add": 0, "del": 0})
+        loc["add"] += additions
+        loc["del"] += deletions
+
+    oids = sections["dates_oid"].tobytes().hex()
+    dates = zip(*[sections[f"dates_{column}"].tolist() for column in ("repo", "name", "branch", "time")])
+    for index, (repo_index, repo_name, branch, timestamp) in enumerate(dates):
+        start, end = index * 40, (index + 1) * 40
+        date = datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        repositories[repo_index][3].setdefault(strings[repo_name], dict()).setdefault(strings[branch], dict())[oids[start:end]] = date
+
+    rollup = zip(*[sections[f"rollup_{column}"].tolist() for column in ("repo", "name", "language", "day", "hour", "commits", "add", "del")])
+    for repo_index, repo_name, language, day, hour, *counters in rollup:
+        days = repositories[repo_index][4].setdefault(strings[repo_name], dict()).setdefault(strings[language], dict())
+        days.setdefault(day, dict())[hour] = counters
+
+    return meta["user"], {key: {"pushedAt": pushed, "data": tuple(data)} for key, pushed, *data in repositories}
+
+
+async def calculate_repository_commit_data(repo_details: Dict, refresh: bool = False) -> Tuple[Dict, Dict, Dict]:
+    """
+    Calculate commit data of a single repository.
+    Commit data is kept separately for each repository, so that it can be reused or recalculated on change.
+
+    :param repo_details: Dictionary with information about the given repository.
+    :param refresh: True for dropping cached repository queries before calculation, false otherwise.
+    :returns: Commit quarter yearly data dictionary, commit date dictionary and rollup data dictionary of the repository.
+    """
+    if refresh:
+        DM.invalidate_remote_graphql("repo_branch_list", owner=repo_details["owner"]["login"], name=repo_details["name"])
+
+    yearly_data = dict()
+    date_data = dict()
+    rollup_data = dict()
+    await update_data_with_commit_stats(repo_details, yearly_data, date_data, rollup_data)
+    return yearly_data, date_data, rollup_data
+
+
+def merge_commit_data(repository_data: Iterable[Tuple[Dict, Dict, Dict]]) -> Tuple[Dict, Dict, Dict]:
+    """
+    Merge commit data of separate repositories into aggregated commit data.
+
+    :param repository_data: Commit quarter yearly data, commit date and rollup data dictionaries of each repository.
+    :returns: Aggregated commit quarter yearly data dictionary, commit date dictionary and rollup data dictionary.
+    """
+    yearly_data = dict()
+    date_data = dict()
+    rollup_data = dict()
+    for repo_yearly_data, repo_date_data, repo_rollup_data in repository_data:
+        for year, quarters in repo_yearly_data.items():
+            for quarter, languages in quarters.items():
+                for language, stats in languages.items():
+                    loc = yearly_data.setdefault(year, dict()).setdefault(quarter, dict()).setdefault(language, {"add": 0, "del": 0})
+                    loc["add"] += stats["add"]
+                    loc["del"] += stats["del"]
+        for repo_name, branches in repo_date_data.items():
+            for branch, commits in branches.items():
+                date_data.setdefault(repo_name, dict()).setdefault(branch, dict()).update(commits)
+        merge_rollup_data(rollup_data, repo_rollup_data)
+    return yearly_data, date_data, rollup_data
+
+
+def _branch_count(repo_details: Dict) -> int:
+    """
+    Gets number of branches of repository from its size hints.
+
+    :param repo_details: Dictionary with information about the given repository.
+    :returns: Number of branches or 0 if it is unknown.
+    """
+    return (repo_details.get("refs") or dict()).get("totalCount") or 0
+
+
+def _repository_cost(repo_details: Dict) -> Tuple[int, int, int]:
+    """
+    Estimates cost of crawling repository from size hints: default branch commit count, number of branches and disk usage.
+
+    :param repo_details: Dictionary with information about the given repository.
+    :returns: Comparable cost tuple, bigger for more expensive repositories.
+    """
+    default_branch = repo_details.get("defaultBranchRef") or dict()
+    history = (default_branch.get("target") or dict()).get("history") or dict()
+    return history.get("totalCount") or 0, _branch_count(repo_details), repo_details.get("diskUsage") or 0
+
+
+async def crawl_repositories(repositories: AsyncIterable[Dict], repository_data: Dict[str, Tuple[Dict, Dict, Dict]]):
+    """
+    Crawls commits of given repositories concurrently, the most expensive repositories first.
+    Crawling starts as soon as the first repository arrives, the repositories arriving later are queued by cost too.
+    Each repository is split into per-branch work units, processed by `CRAWL_WORKERS` workers, so that one huge repository doesn't keep a single worker busy.
+    Repositories having at least `LOCAL_MINING_MIN_COMMITS` commits are mined from local clone as a single work unit instead.
+
+    :param repositories: Iterator of dictionaries with information about the repositories to crawl.
+    :param repository_data: Yearly data, commit date and rollup data dictionaries to update, for each repository ("owner/name").
+        Data of each repository should be added before the repository is yielded by the iterator.
+    """
+    queue = PriorityQueue()
+    order = count()
+
+    async def produce():
+        async for repo in repositories:
+            cost = _repository_cost(repo)
+            queue.put_nowait((tuple(-value for value in cost), next(order), repo, None))
+
+    async def worker():
+        while True:
+            priority, _, repo, branch = await queue.get()
+            try:
+                yearly_data, date_data, rollup_data = repository_data[f"{repo['owner']['login']}/{repo['name']}"]
+                if branch is None and _repository_cost(repo)[0] >= LOCAL_MINING_MIN_COMMITS:
+                    await update_data_with_local_commit_stats(repo, yearly_data, date_data, rollup_data)
+                elif branch is None:
+                    branches = await DM.get_remote_graphql("repo_branch_list", owner=repo["owner"]["login"], name=repo["name"])
+                    if len(branches) == 0:
+                        DBM.w(f"\t\tSkipping repo without branches: {'[private]' if repo['isPrivate'] else repo['name']}.")
+                    for repo_branch in branches:
+                        queue.put_nowait((priority, next(order), repo, repo_branch))
+                else:
+                    await update_data_with_branch_commit_stats(repo, branch, yearly_data, date_data, rollup_data)
+            finally:
+                queue.task_done()
+
+    workers = [create_task(worker()) for _ in range(CRAWL_WORKERS)]
+    stages = list()
+    try:
+        for stage in (produce, queue.join):
+            stages += [create_task(stage())]
+            done, _ = await wait([stages[-1], *workers], return_when=FIRST_COMPLETED)
+            for task in done:
+                task.result()
+    finally:
+        for task in workers + stages:
+            task.cancel()
+
+
+async def update_data_with_commit_stats(repo_details: Dict, yearly_data: Dict, date_data: Dict, rollup_data: Dict):
     """
     Updates yearly commit data with commits from given repository.
     Skips update if the commit isn't related to any repository.
@@ -52,6 +362,7 @@ async def update_data_with_commit_stats(repo_details: Dict, yearly_data: Dict, d
     :param repo_details: Dictionary with information about the given repository.
     :param yearly_data: Yearly data dictionary to update.
     :param date_data: Commit date dictionary to update.
+    :param rollup_data: Rollup data dictionary to update.
     """
     owner = repo_details["owner"]["login"]
     branch_data = await DM.get_remote_graphql("repo_branch_list", owner=owner, name=repo_details["name"])
@@ -60,27 +371,161 @@ async def update_data_with_commit_stats(repo_details: Dict, yearly_data: Dict, d
         return
 
     for branch in branch_data:
-        commit_data = await DM.get_remote_graphql("repo_commit_list", owner=owner, name=repo_details["name"], branch=branch["name"], id=GHM.USER.node_id)
+        await update_data_with_branch_commit_stats(repo_details, branch, yearly_data, date_data, rollup_data)
+
+
+async def update_data_with_branch_commit_stats(repo_details: Dict, branch: Dict, yearly_data: Dict, date_data: Dict, rollup_data: Dict):
+    """
+    Updates yearly commit data with commits from given branch of given repository.
+    Each page of commits is checkpointed to crawl journal, commits recorded by previous interrupted crawl are restored from it.
+
+    :param repo_details: Dictionary with information about the given repository.
+    :param branch: Dictionary with information about the given branch.
+    :param yearly_data: Yearly data dictionary to update.
+    :param date_data: Commit date dictionary to update.
+    :param rollup_data: Rollup data dictionary to update.
+    """
+    owner = repo_details["owner"]["login"]
+    unit = f"{owner}/{repo_details['name']}:{branch['name']}"
+    commit_data, cursor, done = JM.restore(unit, repo_details["pushedAt"])
+    for commit in commit_data:
+        update_data_with_commit(repo_details, branch["name"], commit, yearly_data, date_data, rollup_data)
+    if done:
+        return
+
+    pages = DM.iterate_remote_graphql_pages(
+        "repo_commit_list", after=cursor, owner=owner, name=repo_details["name"], branch=branch["name"], id=GHM.USER.node_id
+    )
+    async for commit_data, page_info in pages:
+        for commit in commit_data:
+            update_data_with_commit(repo_details, branch["name"], commit, yearly_data, date_data, rollup_data)
+        JM.record(unit, repo_details["pushedAt"], commit_data, page_info.get("endCursor"), not page_info["hasNextPage"])
+
+    if not EM.DEBUG_RUN:
+        await sleep(0.4)
+
+
+def update_data_with_commit(repo_details: Dict, branch_name: str, commit: Dict, yearly_data: Dict, date_data: Dict, rollup_data: Dict):
+    """
+    Updates yearly commit data with single commit.
+    Rollup data is updated only once for each commit, even if the commit belongs to several branches.
+
+    :param repo_details: Dictionary with information about the given repository.
+    :param branch_name: Name of the branch the commit belongs to.
+    :param commit: Dictionary with commit "oid", "committedDate" (UTC, ISO format), "additions" and "deletions".
+    :param yearly_data: Yearly data dictionary to update.
+    :param date_data: Commit date dictionary to update.
+    :param rollup_data: Rollup data dictionary to update.
+    """
+    date = search(r"\d+-\d+-\d+", commit["committedDate"]).group()
+    curr_year = datetime.fromisoformat(date).year
+    quarter = (datetime.fromisoformat(date).month - 1) // 3 + 1
+
+    if repo_details["name"] not in date_data:
+        date_data[repo_details["name"]] = dict()
+    if branch_name not in date_data[repo_details["name"]]:
+        date_data[repo_details["name"]][branch_name] = dict()
+    if not any(commit["oid"] in commits for commits in date_data[repo_details["name"]].values()):
+        language = repo_details["primaryLanguage"]["name"] if repo_details["primaryLanguage"] is not None else None
+        update_rollup_data(rollup_data, repo_details["name"], language, commit["committedDate"], commit["additions"], commit["deletions"])
+    date_data[repo_details["name"]][branch_name][commit["oid"]] = commit["committedDate"]
+
+    if repo_details["primaryLanguage"] is not None:
+        if curr_year not in yearly_data:
+            yearly_data[curr_year] = dict()
+        if quarter not in yearly_data[curr_year]:
+            yearly_data[curr_year][quarter] = dict()
+        if repo_details["primaryLanguage"]["name"] not in yearly_data[curr_year][quarter]:
+            yearly_data[curr_year][quarter][repo_details["primaryLanguage"]["name"]] = {"add": 0, "del": 0}
+        yearly_data[curr_year][quarter][repo_details["primaryLanguage"]["name"]]["add"] += commit["additions"]
+        yearly_data[curr_year][quarter][repo_details["primaryLanguage"]["name"]]["del"] += commit["deletions"]
+
+
+async def _run_git(*args: str, stdin: Optional[bytes] = None) -> bytes:
+    """
+    Runs git command, raises exception if it fails.
+
+    :param args: Git command arguments.
+    :param stdin: Command input, no input is passed if None.
+    :returns: Command output.
+    """
+    process = await create_subprocess_exec("git", *args, stdin=None if stdin is None else PIPE, stdout=PIPE, stderr=PIPE)
+    output, error = await process.communicate(stdin)
+    if process.returncode != 0:
+        raise Exception(f"Git command '{args[0]}' failed with code {process.returncode}: {error.decode('utf-8', 'replace').replace(EM.GH_TOKEN, '***')}")
+    return output
+
+
+async def update_data_with_local_commit_stats(
+    repo_details: Dict, yearly_data: Dict, date_data: Dict, rollup_data: Dict, clone_url: Optional[str] = None, emails: Optional[List[str]] = None
+):
+    """
+    Updates yearly commit data with commits from given repository, mined from local clone instead of GitHub API.
+    The repository is cloned bare and blobless, file contents needed for diffs of the user commits are then fetched in a single batch
+    (otherwise git would fetch them lazily, with a separate request for each commit).
+    Commits of each branch are streamed from `git log --numstat` output, filtered by user emails.
+    Mined commits are checkpointed to crawl journal as a single unit, once all the branches are mined.
+
+    :param repo_details: Dictionary with information about the given repository.
+    :param yearly_data: Yearly data dictionary to update.
+    :param date_data: Commit date dictionary to update.
+    :param rollup_data: Rollup data dictionary to update.
+    :param clone_url: Repository URL (or local path) to clone, GitHub repository URL is used if None.
+    :param emails: Commit author emails to collect commits of, current user emails are used if None.
+    """
+    if clone_url is None:
+        clone_url = f"https://{EM.GH_TOKEN}@github.com/{repo_details['owner']['login']}/{repo_details['name']}.git"
+    repo_unit = f"{repo_details['owner']['login']}/{repo_details['name']}"
+    commit_data, _, done = JM.restore(repo_unit, repo_details["pushedAt"])
+    if done:
         for commit in commit_data:
-            date = search(r"\d+-\d+-\d+", commit["committedDate"]).group()
-            curr_year = datetime.fromisoformat(date).year
-            quarter = (datetime.fromisoformat(date).month - 1) // 3 + 1
-
-            if repo_details["name"] not in date_data:
-                date_data[repo_details["name"]] = dict()
-            if branch["name"] not in date_data[repo_details["name"]]:
-                date_data[repo_details["name"]][branch["name"]] = dict()
-            date_data[repo_details["name"]][branch["name"]][commit["oid"]] = commit["committedDate"]
-
-            if repo_details["primaryLanguage"] is not None:
-                if curr_year not in yearly_data:
-                    yearly_data[curr_year] = dict()
-                if quarter not in yearly_data[curr_year]:
-                    yearly_data[curr_year][quarter] = dict()
-                if repo_details["primaryLanguage"]["name"] not in yearly_data[curr_year][quarter]:
-                    yearly_data[curr_year][quarter][repo_details["primaryLanguage"]["name"]] = {"add": 0, "del": 0}
-                yearly_data[curr_year][quarter][repo_details["primaryLanguage"]["name"]]["add"] += commit["additions"]
-                yearly_data[curr_year][quarter][repo_details["primaryLanguage"]["name"]]["del"] += commit["deletions"]
-
-        if not EM.DEBUG_RUN:
-            await sleep(0.4)
+            update_data_with_commit(repo_details, commit["branch"], commit, yearly_data, date_data, rollup_data)
+        return
+
+    emails = GHM.get_user_emails() if emails is None else emails
+    authors = [f"--author=<{email}>" for email in emails]
+
+    branch_commits = list()
+    with TemporaryDirectory() as clone_path:
+        await _run_git("clone", "--bare", "--filter=blob:none", "--no-tags", "--quiet", clone_url, clone_path)
+        refs = await _run_git("-C", clone_path, "for-each-ref", "--format=%(refname:short)", "refs/heads/")
+        branches = refs.decode("utf-8").splitlines()
+        if len(branches) == 0:
+            DBM.w("\t\tSkipping repo.")
+            return
+
+        blobs = set()
+        for branch in branches:
+            args = ["-C", clone_path, "log", f"refs/heads/{branch}", "--fixed-strings", *authors, "--raw", "--no-abbrev", "--no-renames", "--format=", "--"]
+            for line in (await _run_git(*args)).decode("utf-8", "replace").splitlines():
+                if line.startswith(":"):
+                    old_mode, new_mode, old_blob, new_blob, _ = line[1:].split(" ", 4)
+                    blobs |= {blob for mode, blob in ((old_mode, old_blob), (new_mode, new_blob)) if mode != "160000" and blob.strip("0") != ""}
+        if len(blobs) > 0:
+            DBM.i(f"\t\tFetching {len(blobs)} file versions...")
+            fetch_args = ["--no-tags", "--no-write-fetch-head", "--recurse-submodules=no", "--filter=blob:none", "--stdin", "origin"]
+            await _run_git("-C", clone_path, "-c", "fetch.negotiationAlgorithm=noop", "fetch", *fetch_args, stdin="\n".join(sorted(blobs)).encode("utf-8"))
+
+        for branch in branches:
+            args = ["-C", clone_path, "log", f"refs/heads/{branch}", "--fixed-strings", *authors, "--numstat", "--format=%x00%H %ct", "--"]
+            process = await create_subprocess_exec("git", *args, stdout=PIPE, stderr=DEVNULL)
+            commit = None
+            async for line in process.stdout:
+                line = line.decode("utf-8", "replace").rstrip("\n")
+                if line.startswith("\0"):
+                    if commit is not None:
+                        update_data_with_commit(repo_details, branch, commit, yearly_data, date_data, rollup_data)
+                        branch_commits += [dict(commit, branch=branch)]
+                    oid, timestamp = line[1:].split(" ")
+                    date = datetime.fromtimestamp(int(timestamp), timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+                    commit = {"oid": oid, "committedDate": date, "additions": 0, "deletions": 0}
+                elif line != "" and commit is not None:
+                    additions, deletions, _ = line.split("\t", 2)
+                    commit["additions"] += int(additions) if additions != "-" else 0
+                    commit["deletions"] += int(deletions) if deletions != "-" else 0
+            if commit is not None:
+                update_data_with_commit(repo_details, branch, commit, yearly_data, date_data, rollup_data)
+                branch_commits += [dict(commit, branch=branch)]
+            if await process.wait() != 0:
+                raise Exception(f"Git log of branch '{branch}' failed with code {process.returncode}")
+    JM.record(repo_unit, repo_details["pushedAt"], branch_commits, None, True)